@@ -0,0 +1,196 @@
+# agregados.py - Índice de totales mensuales y cubo de agregados para presupuestos y resúmenes
+import heapq
+import math
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+# Dimensiones por las que /resumen puede desglosar los gastos
+DIMENSIONES = ['Categoría', 'Subcategoría', 'Metodo_Pago']
+# Lo que identifica a un gasto repetido para el menú rápido
+CLAVE_FRECUENTE = ['Descripcion', 'Categoría', 'Subcategoría', 'Centavos', 'Metodo_Pago']
+# Origen de la escala de tiempo de los puntajes (cualquier fecha fija sirve: solo importan las diferencias)
+_ORIGEN = pd.Timestamp('2020-01-01')
+
+
+class IndiceMensual:
+    """Totales de gastos por (año, mes) y cada dimensión (categoría, subcategoría, método de pago).
+
+    Internamente se acumulan centavos enteros; las consultas devuelven pesos.
+    """
+
+    def __init__(self):
+        # dimensión -> (año, mes) -> {valor: total en centavos}
+        self._por_dimension = {dimension: defaultdict(lambda: defaultdict(int)) for dimension in DIMENSIONES}
+        # (año, mes) -> cantidad de gastos con monto
+        self._cantidades = defaultdict(int)
+
+    def reconstruir(self, df):
+        """Recalcula todo el índice a partir del DataFrame de Gastos (se usa en cada carga completa)."""
+        for destino in self._por_dimension.values():
+            destino.clear()
+        self._cantidades.clear()
+        self.agregar_df(df)
+
+    def agregar_df(self, df):
+        """Suma al índice un bloque de filas (p. ej. las que trajo una sincronización delta)."""
+        if df is None or df.empty:
+            return
+
+        validos = df.dropna(subset=['Fecha'])
+        año = validos['Fecha'].dt.year.rename('Año')
+        mes = validos['Fecha'].dt.month.rename('Mes')
+        for columna, destino in self._por_dimension.items():
+            # observed=True: con columnas categóricas no queremos una fila por cada categoría sin gastos
+            totales = validos.groupby([año, mes, validos[columna]], observed=True)['Centavos'].sum()
+            for (a, m, clave), total in totales.items():
+                destino[(int(a), int(m))][clave] += int(total)
+        for (a, m), cantidad in validos['Centavos'].notna().groupby([año, mes]).sum().items():
+            self._cantidades[(int(a), int(m))] += int(cantidad)
+
+    def total_categoria(self, año, mes, categoria):
+        return self._por_dimension['Categoría'].get((año, mes), {}).get(categoria, 0) / 100
+
+    def total_subcategoria(self, año, mes, subcategoria):
+        return self._por_dimension['Subcategoría'].get((año, mes), {}).get(subcategoria, 0) / 100
+
+    def resumir_mes(self, año, mes):
+        """Lo mismo que CuboGastos.resumir para un mes calendario, sin recorrer los gastos."""
+        resumen = {
+            'total': sum(self._por_dimension['Categoría'].get((año, mes), {}).values()) / 100,
+            'cantidad': self._cantidades.get((año, mes), 0),
+        }
+        for dimension, destino in self._por_dimension.items():
+            totales = sorted(destino.get((año, mes), {}).items(), key=lambda item: item[1], reverse=True)
+            resumen[dimension] = {clave: total / 100 for clave, total in totales if total}
+        return resumen
+
+
+class CuboGastos:
+    """Gastos sumados por día, categoría, subcategoría y método de pago.
+
+    Se arma con un único groupby sobre df_gastos; las consultas de /resumen filtran
+    y reagrupan este frame, que tiene muchas menos filas que el historial completo.
+    `version` es la versión del libro con la que se calculó.
+    """
+
+    def __init__(self, df, version):
+        self.version = version
+        validos = df.dropna(subset=['Fecha', 'Centavos'])
+        dia = validos['Fecha'].dt.normalize().rename('Dia')
+        agrupado = validos.groupby([dia, *DIMENSIONES], observed=True)['Centavos']
+        self.datos = agrupado.agg(Centavos='sum', Cantidad='count').reset_index()
+
+    def _filas(self, desde, hasta):
+        dias = self.datos['Dia']
+        return self.datos[(dias >= desde) & (dias <= hasta)]
+
+    def resumir(self, desde, hasta):
+        """Totales en pesos entre `desde` y `hasta` (inclusive): total, cantidad y desglose por dimensión."""
+        filas = self._filas(desde, hasta)
+        resumen = {'total': int(filas['Centavos'].sum()) / 100, 'cantidad': int(filas['Cantidad'].sum())}
+        for dimension in DIMENSIONES:
+            totales = filas.groupby(dimension, observed=True)['Centavos'].sum().sort_values(ascending=False)
+            resumen[dimension] = {clave: int(total) / 100 for clave, total in totales.items() if total}
+        return resumen
+
+    def acumulado_diario(self, desde, hasta):
+        """[(día, gasto acumulado en pesos)] para cada día entre `desde` y `hasta`, incluidos los días sin gastos."""
+        filas = self._filas(desde, hasta)
+        por_dia = filas.groupby('Dia')['Centavos'].sum()
+        por_dia.index = por_dia.index.astype('datetime64[ns]')
+        acumulado = por_dia.reindex(pd.date_range(desde, hasta, freq='D'), fill_value=0).cumsum()
+        return [(dia.to_pydatetime(), int(total) / 100) for dia, total in acumulado.items()]
+
+    def totales_por_mes(self, desde, hasta):
+        """{(año, mes): total en pesos} entre `desde` y `hasta`, en orden cronológico."""
+        filas = self._filas(desde, hasta)
+        meses = filas.groupby(filas['Dia'].dt.to_period('M'))['Centavos'].sum()
+        return {(periodo.year, periodo.month): int(total) / 100 for periodo, total in meses.sort_index().items()}
+
+
+class RankingFrecuentes:
+    """Los gastos que más se repiten (misma descripción, subcategoría, monto y método), pesando más los recientes.
+
+    Cada gasto aporta exp(λ·t), con t los días desde una fecha fija y λ = ln 2 / vida_media:
+    un gasto de hace `vida_media` días vale la mitad que uno de hoy. Como el ranking solo
+    compara puntajes entre sí, no hace falta "envejecer" los anteriores al sumar uno nuevo.
+    Los puntajes se guardan en escala logarítmica (log-sum-exp) para que no desborden.
+
+    Los puntajes solo crecen, así que al sumar gastos el top-N únicamente cambia si una
+    de las claves tocadas ya estaba en él o supera al último: no hace falta recorrer
+    todas las claves en cada escritura.
+    """
+
+    def __init__(self, cantidad=4, vida_media_dias=30, minimo=2):
+        self.cantidad = cantidad
+        self.minimo = minimo
+        self._lambda = math.log(2) / vida_media_dias
+        # clave -> log del puntaje / cantidad de veces que se registró
+        self._puntajes = {}
+        self._veces = defaultdict(int)
+        # [(log del puntaje, clave)] de los primeros, de mayor a menor
+        self._primeros = []
+        # [(descripcion, categoria, subcategoria, centavos, metodo)], del más al menos frecuente
+        self.top = []
+
+    def reconstruir(self, df):
+        """Recalcula todo (en cada carga completa): un groupby y un único recorrido de las claves."""
+        self._puntajes.clear()
+        self._veces.clear()
+        self._sumar(df)
+        candidatos = ((puntaje, clave) for clave, puntaje in self._puntajes.items() if self._veces[clave] >= self.minimo)
+        self._primeros = heapq.nlargest(self.cantidad, candidatos)
+        self._publicar()
+
+    def agregar_df(self, df):
+        """Suma un bloque de gastos con un solo groupby y actualiza los primeros solo si hace falta."""
+        cambio = False
+        for clave in self._sumar(df):
+            cambio |= self._considerar(clave)
+        if cambio:
+            self._publicar()
+
+    def _sumar(self, df):
+        """Acumula los puntajes del bloque. Devuelve las claves que cambiaron."""
+        if df is None or df.empty:
+            return []
+        validos = df.dropna(subset=['Fecha', 'Centavos'])
+        validos = validos[validos['Descripcion'].astype(str).str.strip().ne('')]
+        if validos.empty:
+            return []
+        exponente = ((validos['Fecha'] - _ORIGEN).dt.total_seconds() / 86400 * self._lambda).to_numpy(dtype=float)
+        claves = [validos[columna] for columna in CLAVE_FRECUENTE]
+        agrupado = pd.Series(exponente, index=validos.index).groupby(claves, observed=True)
+        # log(Σ exp(x)) = max + log(Σ exp(x - max))
+        maximo = agrupado.transform('max').to_numpy()
+        suma = pd.Series(np.exp(exponente - maximo), index=validos.index).groupby(claves, observed=True).sum()
+        log_puntajes = np.log(suma) + agrupado.max()
+        tocadas = []
+        for clave, log_puntaje, veces in zip(log_puntajes.index, log_puntajes.to_numpy(), agrupado.size().to_numpy()):
+            clave = tuple(clave)
+            previo = self._puntajes.get(clave)
+            self._puntajes[clave] = float(log_puntaje) if previo is None else float(np.logaddexp(previo, log_puntaje))
+            self._veces[clave] += int(veces)
+            tocadas.append(clave)
+        return tocadas
+
+    def _considerar(self, clave):
+        """Mete o reubica `clave` entre los primeros si corresponde. Devuelve True si cambiaron."""
+        if self._veces[clave] < self.minimo or self.cantidad <= 0:
+            return False
+        entrada = (self._puntajes[clave], clave)
+        primeros = [item for item in self._primeros if item[1] != clave]
+        if len(primeros) == len(self._primeros) and len(primeros) >= self.cantidad and entrada <= primeros[-1]:
+            return False
+        primeros.append(entrada)
+        primeros.sort(reverse=True)
+        self._primeros = primeros[:self.cantidad]
+        return True
+
+    def _publicar(self):
+        self.top = [
+            (str(descripcion), str(categoria), str(subcategoria), int(centavos), str(metodo))
+            for _, (descripcion, categoria, subcategoria, centavos, metodo) in self._primeros
+        ]
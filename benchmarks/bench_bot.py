@@ -0,0 +1,183 @@
+# benchmarks/bench_bot.py - Benchmark offline de los caminos calientes del bot
+#
+# Uso (desde la raíz del repo):
+#   python -m benchmarks.bench_bot
+#   python -m benchmarks.bench_bot --tamanos 1000 10000 --latencia 0.2 --repeticiones 50
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+os.chdir(RAIZ)
+sys.path.insert(0, RAIZ)
+
+from benchmarks.hoja_falsa import ClienteFalso, HojaFalsa, SpreadsheetFalso
+from bot import ExpenseBot
+from handlers.resumen import generar_resumen
+from libro import COLUMNAS_GASTOS
+
+USER_ID = 1
+# Un cuarto de los gastos se repite (suscripciones, el chino de la esquina); el resto son descripciones únicas
+DESCRIPCIONES_FRECUENTES = [f"Frecuente {i}" for i in range(40)]
+COMERCIOS = ['Supermercado', 'Farmacia', 'Kiosco', 'Verdulería', 'Uber', 'Mercado Libre', 'Restaurante', 'Nafta']
+
+
+def generar_gastos(bot, cantidad, semilla=42):
+    """Arma un ledger sintético de `cantidad` filas repartidas en los últimos tres años."""
+    azar = random.Random(semilla)
+    subcategorias = [(cat, sub) for cat, subs in bot.categorias.items() for sub in subs]
+    metodos = [metodo for fila in bot.metodos_pago for metodo in fila]
+    hoy = datetime.now()
+    filas = [COLUMNAS_GASTOS]
+    for i in range(cantidad):
+        categoria, subcategoria = azar.choice(subcategorias)
+        fecha = hoy - timedelta(days=azar.randint(0, 3 * 365))
+        filas.append([
+            fecha.strftime("%d/%m/%Y"),
+            descripcion_al_azar(azar),
+            categoria,
+            subcategoria,
+            str(azar.randint(100, 50000)),
+            azar.choice(metodos),
+        ])
+    return filas
+
+
+def descripcion_al_azar(azar):
+    if azar.random() < 0.25:
+        return azar.choice(DESCRIPCIONES_FRECUENTES)
+    return f"{azar.choice(COMERCIOS)} #{azar.randrange(10 ** 9)}"
+
+
+def generar_presupuestos(bot):
+    filas = [['Categoria', 'Presupuesto']]
+    for categoria, subcategorias in bot.categorias.items():
+        filas.append([categoria, '500000'])
+        filas.extend([subcategoria, '50000'] for subcategoria in subcategorias)
+    return filas
+
+
+def crear_bot(cantidad, latencia):
+    # Primero un bot sin hojas para leer categorías y métodos desde config.json
+    base = ExpenseBot(gc=ClienteFalso(None))
+    base.io.cerrar()
+    hojas = [
+        HojaFalsa('Gastos', generar_gastos(base, cantidad), latencia),
+        HojaFalsa('Ingresos', [['Fecha', 'Descripcion', 'Categoria', 'Monto']], latencia),
+        HojaFalsa('PresupuestoBot', generar_presupuestos(base), latencia),
+        HojaFalsa('Ahorros', [['Fecha', 'Monto_Pesos', 'Destino', 'Monto_Dolares']], latencia),
+    ]
+    return ExpenseBot(gc=ClienteFalso(SpreadsheetFalso(hojas))), hojas[0]
+
+
+class TelegramFalso:
+    async def send_message(self, chat_id, text, **kwargs):
+        pass
+
+
+def update_y_contexto(bot):
+    update = SimpleNamespace(
+        message=SimpleNamespace(chat_id=USER_ID),
+        effective_user=SimpleNamespace(id=USER_ID),
+        effective_chat=SimpleNamespace(id=USER_ID),
+    )
+    context = SimpleNamespace(bot_data={'bot': bot}, bot=TelegramFalso(), user_data={}, args=[])
+    return update, context
+
+
+async def medir(nombre, operacion, repeticiones):
+    """Corre la operación `repeticiones` veces y una vez más bajo tracemalloc para el pico de memoria."""
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        await operacion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    tracemalloc.start()
+    await operacion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    tiempos.sort()
+    return {
+        'operacion': nombre,
+        'media_ms': statistics.mean(tiempos),
+        'p50_ms': tiempos[len(tiempos) // 2],
+        'p95_ms': tiempos[min(len(tiempos) - 1, int(len(tiempos) * 0.95))],
+        'pico_kb': pico / 1024,
+    }
+
+
+async def correr(cantidad, latencia, repeticiones):
+    bot, hoja_gastos = crear_bot(cantidad, latencia)
+    libro = await bot.libro(USER_ID)
+    update, context = update_y_contexto(bot)
+    subcategorias = [(cat, sub) for cat, subs in bot.categorias.items() for sub in subs]
+    azar = random.Random(7)
+
+    async def carga_completa():
+        await bot._cargar_datos(completa=True, user_id=USER_ID)
+
+    async def sincronizacion_delta():
+        # Simulamos 10 filas cargadas a mano en la hoja antes de cada sincronización
+        hoja_gastos.agregar_a_mano(generar_gastos(bot, 10, semilla=azar.random())[1:])
+        await bot._cargar_datos(forzar_recarga=True, user_id=USER_ID)
+
+    async def guardar_gasto():
+        categoria, subcategoria = azar.choice(subcategorias)
+        await bot.guardar_gasto(descripcion_al_azar(azar), categoria, subcategoria, 1500.0, '💵 Efectivo', user_id=USER_ID)
+
+    async def verificar_presupuesto():
+        categoria, subcategoria = azar.choice(subcategorias)
+        await bot.verificar_presupuesto(categoria, subcategoria, USER_ID)
+
+    async def resumen():
+        await generar_resumen(update, context)
+
+    resultados = []
+    for nombre, operacion in (
+        ('_cargar_datos (completa)', carga_completa),
+        ('_cargar_datos (delta)', sincronizacion_delta),
+        ('guardar_gasto', guardar_gasto),
+        ('verificar_presupuesto', verificar_presupuesto),
+        ('generar_resumen', resumen),
+    ):
+        resultados.append(await medir(nombre, operacion, repeticiones))
+
+    filas = len(libro.df_gastos)
+    memoria = libro.df_gastos.memory_usage(deep=True).sum()
+    memoria_df = memoria / (1024 * 1024)
+    await bot.cerrar()
+    return resultados, memoria_df, memoria * 100_000 / max(filas, 1) / (1024 * 1024)
+
+
+def imprimir(cantidad, resultados, memoria_df, memoria_100k):
+    print(f"\n=== Ledger de {cantidad:,} filas (df_gastos: {memoria_df:.1f} MB, {memoria_100k:.1f} MB cada 100k filas) ===")
+    print(f"{'operación':<28}{'media ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'pico KB':>12}")
+    for r in resultados:
+        print(f"{r['operacion']:<28}{r['media_ms']:>10.2f}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}{r['pico_kb']:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark offline del bot con una hoja de cálculo falsa.")
+    parser.add_argument('--tamanos', type=int, nargs='+', default=[1_000, 10_000, 100_000],
+                        help="Cantidad de filas de la hoja Gastos a probar.")
+    parser.add_argument('--latencia', type=float, default=0.0,
+                        help="Latencia artificial por llamada a la hoja, en segundos.")
+    parser.add_argument('--repeticiones', type=int, default=20)
+    args = parser.parse_args()
+
+    for cantidad in args.tamanos:
+        resultados, memoria_df, memoria_100k = asyncio.run(correr(cantidad, args.latencia, args.repeticiones))
+        imprimir(cantidad, resultados, memoria_df, memoria_100k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# benchmarks/hoja_falsa.py - Reemplazo en memoria de gspread para medir el bot sin Google Sheets
+import re
+import threading
+import time
+
+from gspread.utils import a1_to_rowcol
+
+
+def _numerizar(valor):
+    """Imita a gspread.get_all_records: los textos numéricos vuelven como int/float."""
+    try:
+        return int(valor)
+    except ValueError:
+        try:
+            return float(valor)
+        except ValueError:
+            return valor
+
+
+class HojaFalsa:
+    """Imita la parte de gspread.Worksheet que usa el bot, con latencia artificial por llamada."""
+
+    def __init__(self, titulo, filas, latencia=0.0):
+        self.title = titulo
+        self.filas = [list(fila) for fila in filas]
+        self.latencia = latencia
+        self.llamadas = 0
+        self._lock = threading.Lock()
+
+    def _esperar(self):
+        self.llamadas += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    def agregar_a_mano(self, filas):
+        """Simula filas cargadas directamente en la hoja (sin pasar por el bot ni contar como llamada)."""
+        with self._lock:
+            self.filas.extend(list(fila) for fila in filas)
+
+    def append_row(self, fila, **kwargs):
+        return self.append_rows([fila], **kwargs)
+
+    def append_rows(self, filas, **kwargs):
+        self._esperar()
+        with self._lock:
+            inicio = len(self.filas) + 1
+            self.filas.extend([str(valor) for valor in fila] for fila in filas)
+            fin = len(self.filas)
+        columnas = max(len(fila) for fila in filas)
+        ultima = chr(ord('A') + columnas - 1)
+        return {'updates': {'updatedRange': f"{self.title}!A{inicio}:{ultima}{fin}", 'updatedRows': len(filas)}}
+
+    def get_all_values(self, **kwargs):
+        self._esperar()
+        with self._lock:
+            ancho = max((len(fila) for fila in self.filas), default=0)
+            return [fila + [''] * (ancho - len(fila)) for fila in self.filas]
+
+    def get_all_records(self, **kwargs):
+        self._esperar()
+        with self._lock:
+            if not self.filas:
+                return []
+            encabezado = self.filas[0]
+            return [dict(zip(encabezado, map(_numerizar, fila))) for fila in self.filas[1:]]
+
+    def batch_get(self, rangos, **kwargs):
+        self._esperar()
+        with self._lock:
+            return [self._leer_rango(rango) for rango in rangos]
+
+    def _leer_rango(self, rango):
+        inicio, _, fin = rango.partition(':')
+        fila_inicio, col_inicio = a1_to_rowcol(inicio)
+        # 'F' (sin número) significa hasta la última fila con datos
+        coincidencia = re.fullmatch(r'([A-Z]+)(\d*)', fin)
+        col_fin = a1_to_rowcol(f"{coincidencia.group(1)}1")[1]
+        fila_fin = int(coincidencia.group(2)) if coincidencia.group(2) else len(self.filas)
+        resultado = []
+        for fila in self.filas[fila_inicio - 1:fila_fin]:
+            valores = fila[col_inicio - 1:col_fin]
+            # La API de Sheets recorta las celdas vacías al final de cada fila
+            while valores and valores[-1] == '':
+                valores.pop()
+            resultado.append(valores)
+        return resultado
+
+
+class SpreadsheetFalso:
+    def __init__(self, hojas):
+        self.hojas = {hoja.title: hoja for hoja in hojas}
+
+    def worksheet(self, titulo):
+        return self.hojas[titulo]
+
+
+class ClienteFalso:
+    """Imita gspread.Client.open_by_key devolviendo siempre el mismo spreadsheet falso."""
+
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+
+    def open_by_key(self, spreadsheet_id):
+        return self.spreadsheet
+
+    def set_timeout(self, timeout):
+        pass
@@ -1,21 +1,29 @@
 # bot.py - Versión Final Fase 1 (con config.json)
 import logging
-import gspread
 import os
 import json # <--- Importante: agregamos la librería json
 import base64
-import pandas as pd
-from google.oauth2.service_account import Credentials
+import time
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import ContextTypes, ConversationHandler
 from datetime import datetime
 import asyncio
+from sheets_io import SheetsIO
+from tenants import RegistroTenants
+from preferencias import AlmacenPreferencias
+from graficos import Graficador
+from idempotencia import FiltroDuplicados
+from configuracion import RUTA_CONFIG, MODO_DEFECTO, Definiciones, VigilanteConfig
+
+# Alias aprendidos que se guardan por usuario (se descartan los más viejos)
+MAX_ALIAS_POR_USUARIO = 200
 
 class ExpenseBot:
-    def __init__(self):
+    def __init__(self, gc=None):
+        """gc: cliente de gspread ya autorizado (opcional, p. ej. para benchmarks); si no se pasa, se autoriza con las credenciales."""
         # --- Carga la configuración desde config.json ---
         try:
-            with open('config.json', 'r', encoding='utf-8') as f:
+            with open(RUTA_CONFIG, 'r', encoding='utf-8') as f:
                 self.config = json.load(f)
         except FileNotFoundError:
             logging.error("¡ERROR! No se encontró el archivo config.json.")
@@ -24,6 +32,113 @@ class ExpenseBot:
             logging.error("¡ERROR! El archivo config.json tiene un formato incorrecto.")
             self.config = {}
 
+        # --- Capa de E/S: las llamadas a Sheets corren en un pool de hilos ---
+        conf_sheets = self.config.get('sheets', {})
+        timeout_sheets = conf_sheets.get('timeout', 30.0)
+        self.io = SheetsIO(max_hilos=conf_sheets.get('hilos', 4), timeout=timeout_sheets)
+
+        # --- Conexión con Google Sheets (un único cliente autorizado, compartido por todos los tenants) ---
+        self.SPREADSHEET_ID = os.getenv('SPREADSHEET_ID')
+        self.timeout_sheets = timeout_sheets
+        # El cliente se autoriza recién cuando se abre el primer libro (ver _cliente_sheets), para arrancar rápido
+        self.gc = gc
+        self._gc_lock = asyncio.Lock()
+
+        # --- Tenants: cada usuario puede tener su propio spreadsheet ---
+        conf_tenants = self.config.get('tenants', {})
+        self.tenants = RegistroTenants(
+            self._abrir_libro,
+            self.SPREADSHEET_ID,
+            usuarios=conf_tenants.get('usuarios', {}),
+            max_libros=conf_tenants.get('max_libros', 50),
+            memoria_max_mb=conf_tenants.get('memoria_max_mb', 256),
+        )
+
+        # --- Definiciones del Bot (cargadas desde config.json, con índices y teclados ya armados) ---
+        self._aplicar_definiciones(Definiciones(self.config, self.formatear_pesos))
+        # Si config.json cambia, se recarga sin reiniciar (ver main.post_init)
+        self.vigilante_config = VigilanteConfig(
+            RUTA_CONFIG, self.formatear_pesos, self._aplicar_config,
+            intervalo=self.config.get('recarga_config', {}).get('intervalo', 5.0),
+        )
+        
+        # Usuarios que pueden ver /stats (IDs de Telegram separados por comas)
+        self.admin_ids = {int(x) for x in os.getenv('ADMIN_IDS', '').split(',') if x.strip()}
+
+        # Gastos repetidos (update reenviado por Telegram o doble toque) que no se vuelven a escribir
+        conf_idempotencia = self.config.get('idempotencia', {})
+        self.duplicados = FiltroDuplicados(
+            ventana=conf_idempotencia.get('ventana', 10.0),
+            ttl_updates=conf_idempotencia.get('ttl_updates', 600.0),
+            max_claves=conf_idempotencia.get('max_claves', 10000),
+        )
+
+        # Gráficos de /grafico: se renderizan en otro proceso y se cachean por versión del libro
+        conf_graficos = self.config.get('graficos', {})
+        self.graficos = Graficador(
+            procesos=conf_graficos.get('procesos', 1),
+            max_imagenes=conf_graficos.get('max_imagenes', 64),
+        )
+
+        # Modos y recordatorios sobreviven a los reinicios: se guardan en disco, agrupando escrituras
+        self.preferencias = AlmacenPreferencias(os.getenv('PREFERENCIAS_PATH', 'preferencias.json'))
+        conf_recordatorios = self.config.get('recordatorios', {})
+        self.horas_recordatorio_defecto = conf_recordatorios.get('horas', ['13:00', '22:00'])
+        self.zona_recordatorio_defecto = conf_recordatorios.get('zona', 'America/Argentina/Buenos_Aires')
+
+    # --- Configuración recargable ---
+
+    def _aplicar_definiciones(self, definiciones):
+        # Sin awaits en el medio: ningún handler ve una mezcla de la configuración vieja y la nueva
+        self.categorias = definiciones.categorias
+        self.metodos_pago = definiciones.metodos_pago
+        self.gastos_rapidos = definiciones.gastos_rapidos
+        self.ingresos_rapidos = definiciones.ingresos_rapidos
+        self.personality_modes = definiciones.personality_modes
+        self.entrada_rapida = definiciones.entrada_rapida
+        self.interfaz = definiciones.interfaz
+
+    def _aplicar_config(self, config, definiciones):
+        """Reemplaza la configuración en caliente. Los libros abiertos y sus cachés se conservan;
+        las secciones que se leen al crear objetos (sheets, tenants, graficos, etc.) piden reiniciar."""
+        self.config = config
+        self._aplicar_definiciones(definiciones)
+
+    # --- Preferencias por usuario (se cargan del disco la primera vez que se usan) ---
+
+    @property
+    def user_modes(self):
+        return self.preferencias.seccion('modos')
+
+    @property
+    def chat_recordatorios(self):
+        """chat_id -> {'horas': [...], 'zona': ...}: cada chat elige sus horarios y su zona horaria."""
+        return self.preferencias.seccion('recordatorios')
+
+    @property
+    def alias_usuarios(self):
+        """user_id -> {texto normalizado: etiqueta de subcategoría o método}: lo que cada usuario nos enseñó."""
+        return self.preferencias.seccion('alias')
+
+    def alias_de(self, user_id):
+        return self.alias_usuarios.get(user_id, {})
+
+    def aprender_alias(self, user_id, alias, etiqueta):
+        alias_usuario = self.alias_usuarios.setdefault(user_id, {})
+        # Lo movemos al final: los alias usados más recientemente son los últimos en descartarse
+        alias_usuario.pop(alias, None)
+        alias_usuario[alias] = etiqueta
+        while len(alias_usuario) > MAX_ALIAS_POR_USUARIO:
+            del alias_usuario[next(iter(alias_usuario))]
+        self.preferencias.marcar_cambio()
+
+    # --- Tenants y libros ---
+
+    def _autorizar(self):
+        """Arma las credenciales y autoriza el cliente de gspread (corre en un hilo aparte)."""
+        import gspread
+        from google.oauth2.service_account import Credentials
+
         # --- Configuración de Credenciales de Google ---
         SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
         if os.getenv('GOOGLE_CREDENTIALS'):
@@ -34,118 +149,103 @@ class ExpenseBot:
         else:
             SERVICE_ACCOUNT_FILE = 'credenciales.json'
             creds = Credentials.from_service_account_file(SERVICE_ACCOUNT_FILE, scopes=SCOPES)
+        gc = gspread.authorize(creds)
+        # Timeout HTTP propio de gspread, para que los hilos del pool no queden colgados para siempre
+        gc.set_timeout(self.timeout_sheets)
+        return gc
 
-        # --- Conexión con Google Sheets ---
-        self.SPREADSHEET_ID = os.getenv('SPREADSHEET_ID')
-        self.gc = gspread.authorize(creds)
-        spreadsheet = self.gc.open_by_key(self.SPREADSHEET_ID)
-        self.sheet_gastos = spreadsheet.worksheet('Gastos')
-        self.sheet_ingresos = spreadsheet.worksheet('Ingresos')
-        self.sheet_presupuesto_bot = spreadsheet.worksheet('PresupuestoBot')
-        self.sheet_ahorros = spreadsheet.worksheet('Ahorros')
-
-        # --- Atributos para el Caché ---
-        self.df_gastos = None
-        self.df_presupuesto = None
-        self._lock = asyncio.Lock()
-
-        # --- Definiciones del Bot (cargadas desde config.json) ---
-        self.categorias = self.config.get('categorias', {})
-        self.metodos_pago = self.config.get('metodos_pago', [])
-        self.gastos_rapidos = self.config.get('gastos_rapidos', {})
-        self.ingresos_rapidos = self.config.get('ingresos_rapidos', {})
-        self.personality_modes = self.config.get('personality_modes', {})
-        
-        self.user_modes = {}
-        self.chat_recordatorios = set()
-
-    # --- El resto del código permanece exactamente igual ---
-
-    async def _cargar_datos(self, forzar_recarga: bool = False):
-        async with self._lock:
-            if forzar_recarga or self.df_gastos is None:
-                logging.info("Recargando datos de Gastos desde Google Sheets...")
-                list_of_lists = self.sheet_gastos.get_all_values()
-                if len(list_of_lists) > 1:
-                    headers = list_of_lists.pop(0)
-                    self.df_gastos = pd.DataFrame(list_of_lists, columns=headers)
-                    self.df_gastos['Monto'] = self.df_gastos['Monto'].str.replace(',', '.', regex=False)
-                    self.df_gastos['Monto'] = pd.to_numeric(self.df_gastos['Monto'], errors='coerce')
-                    self.df_gastos['Fecha'] = pd.to_datetime(self.df_gastos['Fecha'], format='%d/%m/%Y', dayfirst=True, errors='coerce')
-                else:
-                    self.df_gastos = pd.DataFrame(columns=['Fecha', 'Descripcion', 'Categoría', 'Subcategoría', 'Monto', 'Metodo_Pago'])
-
-            if forzar_recarga or self.df_presupuesto is None:
-                logging.info("Recargando datos de PresupuestoBot desde Google Sheets...")
-                records = self.sheet_presupuesto_bot.get_all_records()
-                self.df_presupuesto = pd.DataFrame(records)
+    async def _cliente_sheets(self):
+        if self.gc is None:
+            async with self._gc_lock:
+                if self.gc is None:
+                    self.gc = await asyncio.to_thread(self._autorizar)
+        return self.gc
+
+    async def _abrir_libro(self, spreadsheet_id):
+        # pandas y el resto de la capa de datos se importan recién al abrir el primer libro
+        from libro import Libro
+
+        gc = await self._cliente_sheets()
+        logging.info(f"Abriendo el spreadsheet {spreadsheet_id}...")
+        return await Libro.abrir(gc, spreadsheet_id, self.io, self.config)
+
+    async def precalentar(self, user_id=None):
+        """Conecta con Sheets y carga los cachés del usuario (o del spreadsheet por defecto) en segundo plano."""
+        inicio = time.perf_counter()
+        spreadsheet_id = self.tenants.spreadsheet_de(user_id)
+        try:
+            libro = await self.libro(user_id)
+            await libro.cargar()
+        except Exception as e:
+            logging.error(f"Error precalentando el spreadsheet {spreadsheet_id}: {e}")
+            return
+        logging.info(f"Spreadsheet {spreadsheet_id} listo en {time.perf_counter() - inicio:.2f}s.")
+
+    async def libro(self, user_id=None):
+        """Libro (spreadsheet + cachés) del usuario. Sin user_id se usa el spreadsheet por defecto."""
+        return await self.tenants.libro_para(user_id)
+
+    async def _cargar_datos(self, forzar_recarga: bool = False, completa: bool = False, user_id=None):
+        libro = await self.libro(user_id)
+        await libro.cargar(forzar_recarga=forzar_recarga, completa=completa)
+
+    async def resincronizar(self, user_id=None):
+        """Descarta el caché del usuario y vuelve a leer todo desde Google Sheets."""
+        libro = await self.libro(user_id)
+        await libro.resincronizar()
 
     def formatear_pesos(self, monto):
         s = f"{monto:,.0f}"
         s = s.replace(',', 'X').replace('.', ',').replace('X', '.')
         return f"${s}"
 
-    async def guardar_gasto(self, descripcion, categoria, subcategoria, monto, metodo_pago):
-        fecha = datetime.now().strftime("%d/%m/%Y")
-        self.sheet_gastos.append_row([fecha, descripcion, categoria, subcategoria, monto, metodo_pago])
-        await self._cargar_datos(forzar_recarga=True)
+    async def guardar_gasto(self, descripcion, categoria, subcategoria, monto, metodo_pago, user_id=None):
+        libro = await self.libro(user_id)
+        await libro.guardar_gasto(descripcion, categoria, subcategoria, monto, metodo_pago)
 
-    async def guardar_ingreso(self, descripcion, categoria, monto):
-        fecha = datetime.now().strftime("%d/%m/%Y")
-        self.sheet_ingresos.append_row([fecha, descripcion, categoria, monto])
+    async def guardar_ingreso(self, descripcion, categoria, monto, user_id=None):
+        libro = await self.libro(user_id)
+        await libro.guardar_ingreso(descripcion, categoria, monto)
     
-    async def guardar_ahorro(self, monto_pesos, destino, monto_dolares=0):
-        """Guarda un registro de ahorro en la hoja 'Ahorros'."""
-        fecha = datetime.now().strftime("%d/%m/%Y")
-        # El orden debe coincidir con las columnas que creaste
-        fila = [fecha, monto_pesos, destino, monto_dolares]
-        self.sheet_ahorros.append_row(fila)
-
-    async def obtener_presupuesto_categoria(self, categoria_o_subcategoria: str) -> float:
-        await self._cargar_datos()
-        if self.df_presupuesto is None or self.df_presupuesto.empty or not categoria_o_subcategoria:
-            return 0.0
-
-        presupuesto_fila = self.df_presupuesto[self.df_presupuesto['Categoria'] == categoria_o_subcategoria]
-        
-        if not presupuesto_fila.empty:
-            try:
-                # Intentamos convertir el presupuesto a un número.
-                # Si está vacío o es un texto, el 'except' lo capturará.
-                valor_presupuesto = presupuesto_fila['Presupuesto'].iloc[0]
-                return float(valor_presupuesto)
-            except (ValueError, TypeError):
-                # Si falla la conversión, asumimos 0.
-                return 0.0
-        return 0.0
+    async def guardar_ahorro(self, monto_pesos, destino, monto_dolares=0, user_id=None):
+        """Encola un registro de ahorro para la hoja 'Ahorros' del usuario."""
+        libro = await self.libro(user_id)
+        await libro.guardar_ahorro(monto_pesos, destino, monto_dolares)
+
+    # --- Cola de escritura: apagado y observabilidad ---
+
+    async def cerrar(self):
+        """Vacía las colas de escritura y guarda las preferencias pendientes antes de apagar el bot."""
+        await self.tenants.cerrar()
+        await self.preferencias.guardar()
+        self.graficos.cerrar()
+        self.io.cerrar()
+
+    def estadisticas_escritura(self):
+        return [stats for libro in self.tenants.libros_abiertos for stats in libro.estadisticas_escritura()]
+
+    async def obtener_presupuesto_categoria(self, categoria_o_subcategoria: str, user_id=None) -> float:
+        libro = await self.libro(user_id)
+        return await libro.obtener_presupuesto(categoria_o_subcategoria)
 
     async def verificar_presupuesto(self, categoria, subcategoria, user_id):
-        presupuesto = await self.obtener_presupuesto_categoria(subcategoria)
+        libro = await self.libro(user_id)
+        presupuesto = await libro.obtener_presupuesto(subcategoria)
         categoria_a_verificar = subcategoria
 
         if not presupuesto and categoria:
-            presupuesto = await self.obtener_presupuesto_categoria(categoria)
+            presupuesto = await libro.obtener_presupuesto(categoria)
             categoria_a_verificar = categoria
         
         if not presupuesto:
             return None
 
-        gastado = 0
-        await self._cargar_datos()
-        if self.df_gastos is not None and not self.df_gastos.empty:
-            mes_actual = datetime.now().month
-            año_actual = datetime.now().year
-            df_mes_actual = self.df_gastos[
-                (self.df_gastos['Fecha'].dt.month == mes_actual) &
-                (self.df_gastos['Fecha'].dt.year == año_actual)
-            ]
-            
-            if categoria_a_verificar == subcategoria:
-                gastos_filtrados = df_mes_actual[df_mes_actual['Subcategoría'] == subcategoria]
-                gastado = gastos_filtrados['Monto'].sum()
-            else:
-                gastos_filtrados = df_mes_actual[df_mes_actual['Categoría'] == categoria]
-                gastado = gastos_filtrados['Monto'].sum()
+        await libro.cache_gastos.asegurar()
+        ahora = datetime.now()
+        if categoria_a_verificar == subcategoria:
+            gastado = libro.indice.total_subcategoria(ahora.year, ahora.month, subcategoria)
+        else:
+            gastado = libro.indice.total_categoria(ahora.year, ahora.month, categoria)
 
         if presupuesto > 0:
             porcentaje = (gastado / presupuesto) * 100
@@ -163,18 +263,26 @@ class ExpenseBot:
 
         return None
     
-    def agregar_chat_recordatorio(self, chat_id):
-        self.chat_recordatorios.add(chat_id)
+    def agregar_chat_recordatorio(self, chat_id, horas=None, zona=None):
+        self.chat_recordatorios[chat_id] = {
+            'horas': horas or self.horas_recordatorio_defecto,
+            'zona': zona or self.zona_recordatorio_defecto,
+        }
+        self.preferencias.marcar_cambio()
     
     def remover_chat_recordatorio(self, chat_id):
-        self.chat_recordatorios.discard(chat_id)
+        if self.chat_recordatorios.pop(chat_id, None) is not None:
+            self.preferencias.marcar_cambio()
         
     def get_user_mode(self, user_id):
-        return self.user_modes.get(user_id, 'comprensivo')
+        modo = self.user_modes.get(user_id, MODO_DEFECTO)
+        # Si el modo se sacó de config.json, el usuario vuelve al de por defecto
+        return modo if modo in self.personality_modes else MODO_DEFECTO
     
     def set_user_mode(self, user_id, mode):
         if mode in self.personality_modes:
             self.user_modes[user_id] = mode
+            self.preferencias.marcar_cambio()
             return True
         return False
         
@@ -0,0 +1,67 @@
+# cache_hoja.py - Política de caché por hoja (TTL + stale-while-revalidate)
+import asyncio
+import logging
+import time
+
+from metricas import metricas
+
+
+class PoliticaCache:
+    """Controla cuándo se refresca el caché de una hoja.
+
+    Las lecturas nunca esperan a un refresco si ya hay datos: si el snapshot
+    venció, se devuelve igual y se lanza la recarga en segundo plano.
+    """
+
+    def __init__(self, nombre, cargar, ttl):
+        self.nombre = nombre
+        self._cargar = cargar
+        self.ttl = ttl
+        self._lock = asyncio.Lock()
+        self._cargado_en = None
+        self._tarea = None
+
+    @property
+    def cargado(self):
+        return self._cargado_en is not None
+
+    @property
+    def vencido(self):
+        return not self.cargado or time.monotonic() - self._cargado_en >= self.ttl
+
+    async def asegurar(self):
+        """Garantiza que haya un snapshot. Solo espera la primera vez; después revalida en segundo plano."""
+        if not self.cargado:
+            metricas.contar(f"cache.{self.nombre}.miss")
+            async with self._lock:
+                # Otro handler pudo haberlo cargado mientras esperábamos el lock
+                if not self.cargado:
+                    await self._cargar()
+                    self._cargado_en = time.monotonic()
+        elif self.vencido:
+            metricas.contar(f"cache.{self.nombre}.stale")
+            self.refrescar_en_segundo_plano()
+        else:
+            metricas.contar(f"cache.{self.nombre}.hit")
+
+    def invalidar(self):
+        """Marca el snapshot como vencido: se sigue sirviendo, pero la próxima lectura lo revalida."""
+        if self.cargado:
+            self._cargado_en = time.monotonic() - self.ttl
+
+    async def refrescar(self, **kwargs):
+        """Recarga la hoja y espera a que termine."""
+        async with self._lock:
+            await self._cargar(**kwargs)
+            self._cargado_en = time.monotonic()
+
+    def refrescar_en_segundo_plano(self):
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.get_running_loop().create_task(self._refrescar_seguro())
+
+    async def _refrescar_seguro(self):
+        try:
+            await self.refrescar()
+        except Exception as e:
+            # Seguimos sirviendo el snapshot anterior; se reintenta en la próxima lectura
+            logging.error(f"Error revalidando el caché de '{self.nombre}': {e}")
@@ -0,0 +1,192 @@
+# cola_escritura.py - Cola de escritura diferida (write-behind) por hoja
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from gspread.exceptions import APIError
+
+
+def _mismo_valor(escrito, leido):
+    """Compara lo que mandamos con lo que devuelve la hoja sin formato (los números vuelven como número)."""
+    if escrito in ('', None) or leido in ('', None):
+        return escrito in ('', None) and leido in ('', None)
+    try:
+        return float(escrito) == float(leido)
+    except (TypeError, ValueError):
+        return str(escrito) == str(leido)
+
+
+class ColaEscritura:
+    """Acumula filas de una hoja y las escribe juntas con un solo append_rows."""
+
+    def __init__(self, hoja, nombre, io, intervalo_flush=2.0, tamano_lote=50, al_escribir=None):
+        self.hoja = hoja
+        self.nombre = nombre
+        self.io = io
+        self.intervalo_flush = intervalo_flush
+        self.tamano_lote = tamano_lote
+        # Callback opcional (async) que recibe (lote, respuesta) después de cada escritura
+        self.al_escribir = al_escribir
+
+        self._pendientes = []
+        # Lote cuyo append_rows falló sin respuesta de Google (timeout, conexión caída):
+        # no sabemos si se escribió, así que se verifica antes de volver a mandarlo
+        self._sin_confirmar = None
+        self._lote_lleno = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._tarea = None
+
+        # --- Métricas observables ---
+        self.filas_escritas = 0
+        self.lotes_escritos = 0
+        self.errores = 0
+        self.ultima_latencia = 0.0
+        self.latencia_maxima = 0.0
+
+    @property
+    def profundidad(self):
+        """Cantidad de filas encoladas que todavía no llegaron a Google Sheets."""
+        return len(self._sin_confirmar or []) + len(self._pendientes)
+
+    def filas_pendientes(self):
+        """Copia de las filas que todavía no se escribieron, en orden de llegada."""
+        return list(self._sin_confirmar or []) + list(self._pendientes)
+
+    @asynccontextmanager
+    async def pausada(self):
+        """Impide que se escriba un lote mientras dura el bloque (p. ej. durante una recarga completa)."""
+        async with self._flush_lock:
+            yield
+
+    def encolar(self, fila):
+        """Agrega una fila a la cola. No bloquea: la escritura ocurre en segundo plano."""
+        self._pendientes.append(fila)
+        if len(self._pendientes) >= self.tamano_lote:
+            self._lote_lleno.set()
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.get_running_loop().create_task(self._loop())
+
+    async def encolar_lote(self, filas):
+        """Encola muchas filas juntas y las escribe enseguida, con lo que ya había, en un único append_rows.
+
+        Devuelve False si la escritura falló (las filas quedan en la cola para el próximo flush).
+        """
+        self._pendientes.extend(filas)
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.get_running_loop().create_task(self._loop())
+        errores = self.errores
+        await self.flush()
+        return self.errores == errores
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._lote_lleno.wait(), timeout=self.intervalo_flush)
+            except asyncio.TimeoutError:
+                pass
+            self._lote_lleno.clear()
+            try:
+                await self.flush()
+            except Exception:
+                # Si el loop muere, todo lo que se encole después queda sin escribir
+                logging.exception(f"Error inesperado vaciando la cola de '{self.nombre}'")
+
+    async def _confirmar_lote(self):
+        """Decide qué pasó con el lote sin confirmar mirando el final de la hoja.
+
+        Devuelve una respuesta equivalente a la de append_rows si el lote ya estaba escrito,
+        o None si no estaba (y lo vuelve a poner al frente de la cola). Si la lectura falla,
+        el lote sigue sin confirmar y se lanza la excepción.
+        """
+        lote = self._sin_confirmar
+        valores = await self.io.llamar(self.hoja.get_all_values, value_render_option='UNFORMATTED_VALUE')
+        ultimas = valores[-len(lote):] if len(valores) >= len(lote) else []
+        escrito = len(ultimas) == len(lote) and all(
+            all(_mismo_valor(valor, (list(leida) + [''] * len(fila))[i]) for i, valor in enumerate(fila))
+            for fila, leida in zip(lote, ultimas)
+        )
+        self._sin_confirmar = None
+        if not escrito:
+            self._pendientes[:0] = lote
+            logging.info(f"'{self.nombre}': el lote de {len(lote)} filas sin confirmar no se había escrito; se reintenta.")
+            return None
+        logging.info(f"'{self.nombre}': el lote de {len(lote)} filas sin confirmar ya estaba escrito.")
+        primera_fila = len(valores) - len(lote) + 1
+        return {'updates': {'updatedRange': f"'{self.nombre}'!A{primera_fila}"}}
+
+    async def flush(self):
+        """Escribe todas las filas pendientes en un único append_rows."""
+        escritos = []
+        async with self._flush_lock:
+            if self._sin_confirmar:
+                lote = self._sin_confirmar
+                try:
+                    respuesta = await self._confirmar_lote()
+                except Exception as e:
+                    self.errores += 1
+                    logging.error(f"No se pudo verificar el lote sin confirmar de '{self.nombre}': {e!r}")
+                    return
+                if respuesta is not None:
+                    self._registrar_escritura(lote, 0.0)
+                    escritos.append((lote, respuesta))
+
+            if self._pendientes:
+                lote, self._pendientes = self._pendientes, []
+                inicio = time.perf_counter()
+                try:
+                    # Sin timeout de asyncio: cortar la espera no cancela el append_rows del hilo
+                    respuesta = await self.io.llamar(self.hoja.append_rows, lote, idempotente=False)
+                except APIError as e:
+                    # Google respondió con un error: el lote no se escribió y se puede reintentar tal cual
+                    self._pendientes[:0] = lote
+                    self.errores += 1
+                    logging.error(f"Error escribiendo {len(lote)} filas en '{self.nombre}': {e!r}")
+                except Exception as e:
+                    # Timeout HTTP o conexión caída: no sabemos si se escribió. Se verifica en el próximo flush
+                    self._sin_confirmar = lote
+                    self.errores += 1
+                    logging.error(f"Resultado desconocido al escribir {len(lote)} filas en '{self.nombre}': {e!r}")
+                else:
+                    self._registrar_escritura(lote, time.perf_counter() - inicio)
+                    escritos.append((lote, respuesta))
+
+        if self.al_escribir:
+            for lote, respuesta in escritos:
+                # Las filas ya están en la hoja: un error acá no tiene que parecer una escritura fallida
+                try:
+                    await self.al_escribir(lote, respuesta)
+                except Exception:
+                    logging.exception(f"Error procesando el lote recién escrito en '{self.nombre}'")
+
+    def _registrar_escritura(self, lote, latencia):
+        self.filas_escritas += len(lote)
+        self.lotes_escritos += 1
+        self.ultima_latencia = latencia
+        self.latencia_maxima = max(self.latencia_maxima, latencia)
+        logging.info(f"'{self.nombre}': {len(lote)} filas escritas en {latencia:.2f}s")
+
+    async def cerrar(self):
+        """Detiene el loop de fondo y vacía la cola (se llama al apagar el bot)."""
+        if self._tarea and not self._tarea.done():
+            # Tomamos el lock para no cancelar un append_rows a mitad de camino
+            async with self._flush_lock:
+                self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+        if self.profundidad:
+            logging.error(f"'{self.nombre}': se perdieron {self.profundidad} filas sin escribir al cerrar.")
+
+    def estadisticas(self):
+        return {
+            'hoja': self.nombre,
+            'profundidad': self.profundidad,
+            'filas_escritas': self.filas_escritas,
+            'lotes_escritos': self.lotes_escritos,
+            'errores': self.errores,
+            'ultima_latencia': self.ultima_latencia,
+            'latencia_maxima': self.latencia_maxima,
+        }
@@ -0,0 +1,144 @@
+# configuracion.py - Lectura, validación y recarga en caliente de config.json
+import asyncio
+import json
+import logging
+import os
+
+from entrada_rapida import IndiceEntradaRapida
+from interfaz import Interfaz
+
+RUTA_CONFIG = 'config.json'
+# Modo que se usa cuando el usuario no eligió ninguno (ver ExpenseBot.get_user_mode)
+MODO_DEFECTO = 'comprensivo'
+
+
+def leer_config(ruta=RUTA_CONFIG):
+    """Lee y valida el archivo. Lanza ValueError con un mensaje legible si algo está mal."""
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f"No se encontró el archivo {ruta}.")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"El archivo {ruta} tiene un formato incorrecto: {e}")
+    validar_config(config)
+    return config
+
+
+def _es_lista_de_textos(valor):
+    return isinstance(valor, list) and all(isinstance(item, str) for item in valor)
+
+
+def validar_config(config):
+    """Chequea lo que usan los handlers; lo demás (sheets, cache, etc.) tiene valores por defecto."""
+    if not isinstance(config, dict):
+        raise ValueError("config.json tiene que ser un objeto.")
+
+    categorias = config.get('categorias', {})
+    if not isinstance(categorias, dict) or not all(_es_lista_de_textos(subs) for subs in categorias.values()):
+        raise ValueError("'categorias' tiene que ser {categoría: [subcategorías]}.")
+
+    metodos_pago = config.get('metodos_pago', [])
+    if not isinstance(metodos_pago, list) or not all(_es_lista_de_textos(fila) for fila in metodos_pago):
+        raise ValueError("'metodos_pago' tiene que ser una lista de filas de botones.")
+
+    for clave, gasto in config.get('gastos_rapidos', {}).items():
+        if not isinstance(gasto, dict) or not all(campo in gasto for campo in ('descripcion', 'categoria', 'monto')):
+            raise ValueError(f"Al gasto rápido '{clave}' le falta descripcion, categoria o monto.")
+        if not isinstance(gasto['monto'], (int, float)):
+            raise ValueError(f"El monto del gasto rápido '{clave}' tiene que ser un número.")
+        if gasto['categoria'] not in categorias:
+            raise ValueError(f"El gasto rápido '{clave}' usa la categoría '{gasto['categoria']}', que no existe.")
+        subcategoria = gasto.get('subcategoria', '')
+        if subcategoria and subcategoria not in categorias[gasto['categoria']]:
+            raise ValueError(f"El gasto rápido '{clave}' usa la subcategoría '{subcategoria}', que no existe.")
+
+    for clave, ingreso in config.get('ingresos_rapidos', {}).items():
+        if not isinstance(ingreso, dict) or 'categoria' not in ingreso:
+            raise ValueError(f"Al ingreso rápido '{clave}' le falta la categoria.")
+
+    modos = config.get('personality_modes', {})
+    for clave, modo in modos.items():
+        if not isinstance(modo, dict) or 'name' not in modo or not isinstance(modo.get('messages'), dict):
+            raise ValueError(f"Al modo '{clave}' le falta name o messages.")
+    if modos and MODO_DEFECTO not in modos:
+        raise ValueError(f"Falta el modo '{MODO_DEFECTO}', que es el que se usa por defecto.")
+
+
+class Definiciones:
+    """Categorías, métodos de pago, gastos/ingresos rápidos y modos, con sus índices y teclados ya compilados.
+
+    Se arma completa antes de usarse, así el bot puede reemplazar la anterior de una sola vez.
+    """
+
+    def __init__(self, config, formatear_pesos):
+        self.categorias = config.get('categorias', {})
+        self.metodos_pago = config.get('metodos_pago', [])
+        self.gastos_rapidos = config.get('gastos_rapidos', {})
+        self.ingresos_rapidos = config.get('ingresos_rapidos', {})
+        self.personality_modes = config.get('personality_modes', {})
+        # Índice para los gastos escritos en una línea ('chino 3500 mp')
+        self.entrada_rapida = IndiceEntradaRapida(self.categorias, self.metodos_pago, self.gastos_rapidos)
+        # Teclados y validadores de los handlers
+        self.interfaz = Interfaz(
+            self.categorias, self.metodos_pago, self.gastos_rapidos, self.ingresos_rapidos,
+            self.personality_modes, formatear_pesos,
+        )
+
+
+class VigilanteConfig:
+    """Revisa cada `intervalo` segundos si cambió la fecha de modificación de config.json.
+
+    Si cambió, lee, valida y compila la configuración nueva en un hilo aparte y
+    recién entonces llama a `al_cambiar(config, definiciones)`. Un archivo con
+    errores se ignora (el bot sigue con la configuración anterior) hasta que se
+    vuelva a modificar.
+    """
+
+    def __init__(self, ruta, formatear_pesos, al_cambiar, intervalo=5.0):
+        self.ruta = ruta
+        self.formatear_pesos = formatear_pesos
+        self.al_cambiar = al_cambiar
+        self.intervalo = intervalo
+        self._mtime = self._leer_mtime()
+        self.recargas = 0
+        self.errores = 0
+        self.ultimo_error = None
+
+    def _leer_mtime(self):
+        try:
+            return os.stat(self.ruta).st_mtime_ns
+        except OSError:
+            return None
+
+    def _compilar(self):
+        config = leer_config(self.ruta)
+        return config, Definiciones(config, self.formatear_pesos)
+
+    async def revisar(self):
+        """Recarga si el archivo cambió desde la última revisión. Devuelve True si se aplicó una configuración nueva."""
+        mtime = self._leer_mtime()
+        if mtime is None or mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        try:
+            config, definiciones = await asyncio.to_thread(self._compilar)
+        except Exception as e:
+            # Archivo a medio escribir, sin permisos o con una forma que no esperamos: seguimos con el anterior
+            self.errores += 1
+            self.ultimo_error = str(e) if isinstance(e, ValueError) else repr(e)
+            logging.exception(f"No se aplicó el nuevo {self.ruta}")
+            return False
+        self.al_cambiar(config, definiciones)
+        self.recargas += 1
+        self.ultimo_error = None
+        logging.info(f"🔄 {self.ruta} recargado.")
+        return True
+
+    async def vigilar(self):
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                await self.revisar()
+            except Exception:
+                logging.exception(f"Error revisando {self.ruta}")
@@ -0,0 +1,140 @@
+# difusion.py - Envío masivo de mensajes con límite de tasa global y por chat
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
+
+from metricas import metricas
+
+
+def _segundos(valor):
+    """RetryAfter.retry_after puede ser int o timedelta según la versión de python-telegram-bot."""
+    return valor.total_seconds() if hasattr(valor, 'total_seconds') else float(valor)
+
+
+class CubetaTokens:
+    """Token bucket: permite ráfagas de hasta `capacidad` mensajes y `tasa` mensajes por segundo sostenidos."""
+
+    def __init__(self, tasa, capacidad=None):
+        self.tasa = tasa
+        self.capacidad = capacidad or tasa
+        self._tokens = self.capacidad
+        self._actualizado = time.monotonic()
+        self._pausa_hasta = 0.0
+
+    def pausar(self, segundos):
+        """Frena todos los envíos (p. ej. cuando Telegram responde RetryAfter)."""
+        self._pausa_hasta = max(self._pausa_hasta, time.monotonic() + segundos)
+        self._tokens = 0
+
+    async def tomar(self):
+        while True:
+            ahora = time.monotonic()
+            if ahora < self._pausa_hasta:
+                await asyncio.sleep(self._pausa_hasta - ahora)
+                continue
+            self._tokens = min(self.capacidad, self._tokens + (ahora - self._actualizado) * self.tasa)
+            self._actualizado = ahora
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.tasa)
+
+
+class Difusor:
+    """Manda un mismo mensaje a muchos chats en paralelo, respetando los límites de Telegram."""
+
+    def __init__(self, bot_telegram, mensajes_por_segundo=25, intervalo_por_chat=1.0, concurrencia=20,
+                 max_reintentos=3, al_bloquear=None):
+        self.bot_telegram = bot_telegram
+        self.cubeta = CubetaTokens(mensajes_por_segundo)
+        self.intervalo_por_chat = intervalo_por_chat
+        self.concurrencia = concurrencia
+        self.max_reintentos = max_reintentos
+        # Callback que recibe el chat_id de un chat que bloqueó al bot o ya no existe
+        self.al_bloquear = al_bloquear
+        self._ultimo_envio = {}
+        self.ultimo_reporte = None
+
+    async def _esperar_turno_chat(self, chat_id):
+        ultimo = self._ultimo_envio.get(chat_id)
+        if ultimo is not None:
+            espera = ultimo + self.intervalo_por_chat - time.monotonic()
+            if espera > 0:
+                await asyncio.sleep(espera)
+        self._ultimo_envio[chat_id] = time.monotonic()
+
+    async def _enviar(self, chat_id, texto, kwargs, resultado):
+        for intento in range(self.max_reintentos + 1):
+            await self._esperar_turno_chat(chat_id)
+            await self.cubeta.tomar()
+            try:
+                await self.bot_telegram.send_message(chat_id=chat_id, text=texto, **kwargs)
+                resultado['enviados'] += 1
+                return
+            except RetryAfter as e:
+                resultado['retry_after'] += 1
+                self.cubeta.pausar(_segundos(e.retry_after))
+            except Forbidden:
+                resultado['bloqueados'] += 1
+                if self.al_bloquear:
+                    self.al_bloquear(chat_id)
+                return
+            except BadRequest as e:
+                if 'chat not found' in str(e).lower():
+                    resultado['bloqueados'] += 1
+                    if self.al_bloquear:
+                        self.al_bloquear(chat_id)
+                else:
+                    resultado['fallidos'] += 1
+                    logging.error(f"Error enviando mensaje a {chat_id}: {e}")
+                return
+            except NetworkError as e:
+                logging.warning(f"Error de red enviando a {chat_id} (intento {intento + 1}): {e}")
+                await asyncio.sleep(2 ** intento)
+            except TelegramError as e:
+                # Cualquier otro error (ChatMigrated, InvalidToken, ...) falla solo para este chat
+                resultado['fallidos'] += 1
+                logging.error(f"Error enviando mensaje a {chat_id}: {e!r}")
+                return
+        resultado['fallidos'] += 1
+
+    async def difundir(self, chat_ids, texto, nombre='difusion', **kwargs):
+        """Envía `texto` a todos los chats y devuelve un reporte con envíos, fallas y mensajes por segundo."""
+        chat_ids = list(chat_ids)
+        resultado = Counter()
+        semaforo = asyncio.Semaphore(self.concurrencia)
+
+        async def enviar_con_limite(chat_id):
+            async with semaforo:
+                await self._enviar(chat_id, texto, kwargs, resultado)
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(enviar_con_limite(chat_id) for chat_id in chat_ids))
+        duracion = time.perf_counter() - inicio
+
+        # Olvidamos los chats que ya no necesitan espera, para que el diccionario no crezca sin límite
+        limite = time.monotonic() - self.intervalo_por_chat
+        self._ultimo_envio = {chat: momento for chat, momento in self._ultimo_envio.items() if momento > limite}
+
+        reporte = {
+            'nombre': nombre,
+            'destinatarios': len(chat_ids),
+            'enviados': resultado['enviados'],
+            'fallidos': resultado['fallidos'],
+            'bloqueados': resultado['bloqueados'],
+            'retry_after': resultado['retry_after'],
+            'duracion': duracion,
+            'mensajes_por_segundo': resultado['enviados'] / duracion if duracion else 0.0,
+        }
+        for clave in ('enviados', 'fallidos', 'bloqueados', 'retry_after'):
+            metricas.contar(f"{nombre}.{clave}", reporte[clave])
+        self.ultimo_reporte = reporte
+        logging.info(
+            f"Difusión '{nombre}': {reporte['enviados']}/{reporte['destinatarios']} enviados, "
+            f"{reporte['fallidos']} fallidos, {reporte['bloqueados']} bloqueados, "
+            f"{reporte['retry_after']} RetryAfter, {reporte['mensajes_por_segundo']:.1f} msg/s en {duracion:.1f}s"
+        )
+        return reporte
@@ -0,0 +1,195 @@
+# entrada_rapida.py - Interpretación de gastos escritos en una línea ("chino 3500 mp")
+import re
+
+from textos import normalizar_texto
+
+_FIN = '$'
+_TODOS = '*'
+
+_MONTO = re.compile(r'^\$?(\d[\d.,]*)(k|mil)?$', re.IGNORECASE)
+
+
+def parsear_monto(palabra):
+    """'3500', '3.500', '3500,50', '$1.234,5' o '20k' -> float. None si la palabra no es un monto."""
+    coincidencia = _MONTO.match(palabra.strip())
+    if not coincidencia:
+        return None
+    numero, miles = coincidencia.groups()
+    if ',' in numero and '.' in numero:
+        # El separador decimal es el último que aparece
+        decimal = ',' if numero.rfind(',') > numero.rfind('.') else '.'
+        miles_sep = '.' if decimal == ',' else ','
+        numero = numero.replace(miles_sep, '').replace(decimal, '.')
+    else:
+        for separador in ',.':
+            partes = numero.split(separador)
+            if len(partes) > 1:
+                # Con exactamente 3 dígitos después es separador de miles ('3.500'); si no, decimal
+                es_miles = all(len(parte) == 3 for parte in partes[1:])
+                numero = ''.join(partes) if es_miles else '.'.join([''.join(partes[:-1]), partes[-1]])
+    try:
+        valor = float(numero)
+    except ValueError:
+        return None
+    return valor * 1000 if miles else valor
+
+
+class Trie:
+    """Trie de nombres normalizados. Cada nodo guarda todos los destinos de su subárbol,
+    así una búsqueda por prefijo cuesta lo que mide el prefijo."""
+
+    def __init__(self):
+        self.raiz = {_TODOS: set()}
+
+    def insertar(self, clave, destino):
+        nodo = self.raiz
+        nodo[_TODOS].add(destino)
+        for letra in clave:
+            nodo = nodo.setdefault(letra, {_TODOS: set()})
+            nodo[_TODOS].add(destino)
+        nodo.setdefault(_FIN, set()).add(destino)
+
+    def buscar(self, prefijo):
+        """(destinos con ese nombre exacto, destinos cuyo nombre empieza con el prefijo)."""
+        nodo = self.raiz
+        for letra in prefijo:
+            nodo = nodo.get(letra)
+            if nodo is None:
+                return set(), set()
+        return nodo.get(_FIN, set()), nodo[_TODOS]
+
+
+class DestinoGasto:
+    """A qué se imputa un gasto: categoría, subcategoría y, si es un gasto rápido, descripción y monto."""
+
+    def __init__(self, etiqueta, categoria, subcategoria='', descripcion=None, monto=None):
+        self.etiqueta = etiqueta
+        self.categoria = categoria
+        self.subcategoria = subcategoria
+        self.descripcion = descripcion
+        self.monto = monto
+
+
+class Entrada:
+    """Resultado de interpretar una línea. gasto/metodo quedan en None si no se pudieron resolver;
+    en ese caso `candidatos_*` tiene las opciones y `alias_*` el texto que escribió el usuario."""
+
+    def __init__(self, monto, descripcion, gasto, candidatos_gasto, alias_gasto, metodo, candidatos_metodo, alias_metodo):
+        self.monto = monto
+        self.descripcion = descripcion
+        self.gasto = gasto
+        self.candidatos_gasto = candidatos_gasto
+        self.alias_gasto = alias_gasto
+        self.metodo = metodo
+        self.candidatos_metodo = candidatos_metodo
+        self.alias_metodo = alias_metodo
+
+    @property
+    def completa(self):
+        return self.gasto is not None and self.metodo is not None and self.monto is not None
+
+
+class IndiceEntradaRapida:
+    """Índice de categorías, subcategorías, gastos rápidos y métodos de pago, armado una vez desde config.json.
+
+    Los nombres se indexan sin acentos ni emojis, y también a partir de cada palabra
+    ('bbva credito' se encuentra escribiendo 'credito' o 'cred').
+    """
+
+    def __init__(self, categorias, metodos_pago, gastos_rapidos):
+        self._trie_gastos = Trie()
+        self._trie_metodos = Trie()
+        self.gastos_por_etiqueta = {}
+        # Nombre completo normalizado (etiqueta o descripción) -> gasto rápido
+        self._rapidos_por_nombre = {}
+        self.metodos = [metodo for fila in metodos_pago for metodo in fila]
+
+        for categoria, subcategorias in categorias.items():
+            self._agregar_gasto(categoria, DestinoGasto(categoria, categoria))
+            for subcategoria in subcategorias:
+                self._agregar_gasto(subcategoria, DestinoGasto(subcategoria, categoria, subcategoria))
+        for etiqueta, gasto in gastos_rapidos.items():
+            destino = DestinoGasto(
+                etiqueta, gasto['categoria'], gasto.get('subcategoria', ''), gasto['descripcion'], gasto['monto']
+            )
+            self._agregar_gasto(etiqueta, destino)
+            self._insertar(self._trie_gastos, gasto['descripcion'], destino)
+            for nombre in (etiqueta, gasto['descripcion']):
+                self._rapidos_por_nombre[normalizar_texto(nombre)] = destino
+        for metodo in self.metodos:
+            self._insertar(self._trie_metodos, metodo, metodo)
+
+    def _agregar_gasto(self, etiqueta, destino):
+        self.gastos_por_etiqueta[etiqueta] = destino
+        self._insertar(self._trie_gastos, etiqueta, destino)
+
+    @staticmethod
+    def _insertar(trie, nombre, destino):
+        palabras = normalizar_texto(nombre).split()
+        for i in range(len(palabras)):
+            trie.insertar(' '.join(palabras[i:]), destino)
+
+    @staticmethod
+    def _resolver(trie, texto, alias, por_etiqueta):
+        """Lista de destinos posibles para `texto`: el alias del usuario, un nombre exacto o los que empiezan así."""
+        if texto in alias and alias[texto] in por_etiqueta:
+            return [por_etiqueta[alias[texto]]]
+        exactos, con_prefijo = trie.buscar(texto)
+        if len(exactos) == 1:
+            return list(exactos)
+        return list(exactos or con_prefijo)
+
+    def interpretar(self, texto, alias=None):
+        """Interpreta 'chino 3500 mp', 'nafta 20000 bbva credito' o 'cafe'. None si no parece un gasto."""
+        alias = alias or {}
+        metodos_por_etiqueta = {metodo: metodo for metodo in self.metodos}
+
+        # Un gasto rápido escrito completo ('coquita 175') gana aunque tenga números
+        rapido = self._rapidos_por_nombre.get(normalizar_texto(texto))
+        if rapido is not None:
+            return Entrada(rapido.monto, rapido.descripcion, rapido, [], None, None, self.metodos, None)
+
+        monto, palabras = None, []
+        for palabra in texto.split():
+            valor = parsear_monto(palabra) if monto is None else None
+            if valor is not None:
+                monto = valor
+            else:
+                palabras.append(palabra)
+        normalizadas = [normalizar_texto(palabra) for palabra in palabras]
+        palabras = [palabra for palabra, normalizada in zip(palabras, normalizadas) if normalizada]
+        normalizadas = [normalizada for normalizada in normalizadas if normalizada]
+        if not normalizadas:
+            return None
+
+        # Probamos cortes de mayor a menor: las primeras palabras son el gasto y el resto el método.
+        # Si ninguno resuelve todo, nos quedamos con el que mejor resuelve el método
+        # (único > con candidatos > sin método) para preguntar solo lo que falta.
+        mejor, puntaje_mejor = None, -1
+        for corte in range(len(normalizadas), 0, -1):
+            texto_metodo = ' '.join(normalizadas[corte:])
+            gastos = self._resolver(self._trie_gastos, ' '.join(normalizadas[:corte]), alias, self.gastos_por_etiqueta)
+            metodos = self._resolver(self._trie_metodos, texto_metodo, alias, metodos_por_etiqueta) if texto_metodo else []
+            if len(gastos) == 1 and (not texto_metodo or len(metodos) == 1):
+                mejor = (corte, gastos, metodos)
+                break
+            puntaje = 2 if len(metodos) == 1 else 1 if metodos else 0
+            if puntaje > puntaje_mejor:
+                mejor, puntaje_mejor = (corte, gastos, metodos), puntaje
+
+        corte, gastos, metodos = mejor
+        gasto = gastos[0] if len(gastos) == 1 else None
+        metodo = metodos[0] if len(metodos) == 1 else None
+        if monto is None:
+            if gasto is None or gasto.monto is None:
+                # Sin monto solo aceptamos gastos rápidos: cualquier otro texto no es un gasto
+                return None
+            monto = gasto.monto
+
+        descripcion = gasto.descripcion if gasto is not None and gasto.descripcion else ' '.join(palabras[:corte]).capitalize()
+        texto_metodo = ' '.join(normalizadas[corte:]) or None
+        return Entrada(
+            monto, descripcion,
+            gasto, sorted(gastos, key=lambda destino: destino.etiqueta) if gasto is None else [], ' '.join(normalizadas[:corte]),
+            metodo, (sorted(metodos) or self.metodos) if metodo is None else [], texto_metodo,
+        )
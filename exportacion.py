@@ -0,0 +1,62 @@
+# exportacion.py - Exportación de hojas a CSV o Parquet, escrita por partes fuera del event loop
+FORMATOS = ('csv', 'parquet')
+
+# Filas que se formatean y escriben por vez: acota la memoria extra de una exportación grande
+TAMANO_CHUNK = 5000
+
+
+def parquet_disponible():
+    """pyarrow es opcional: sin él solo se puede exportar a CSV."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _preparar_parte(parte, formato):
+    """Convierte una parte del frame cacheado a columnas exportables (pesos, fechas y texto plano)."""
+    cambios = {}
+    for columna in parte.columns:
+        if parte[columna].dtype.name == 'category':
+            cambios[columna] = parte[columna].astype(str)
+    if 'Centavos' in parte:
+        cambios['Centavos'] = parte['Centavos'] / 100
+    if formato == 'csv' and 'Fecha' in parte:
+        cambios['Fecha'] = parte['Fecha'].dt.strftime('%d/%m/%Y')
+    return parte.assign(**cambios).rename(columns={'Centavos': 'Monto'})
+
+
+def escribir_archivo(df, formato, ruta, tamano_chunk=TAMANO_CHUNK):
+    """Escribe `df` en `ruta` de a `tamano_chunk` filas y devuelve cuántas filas escribió.
+
+    Es bloqueante: se llama con asyncio.to_thread para no frenar al resto de los usuarios.
+    """
+    if formato == 'parquet':
+        return _escribir_parquet(df, ruta, tamano_chunk)
+
+    # utf-8-sig para que Excel reconozca los acentos y emojis al abrir el CSV
+    with open(ruta, 'w', encoding='utf-8-sig', newline='') as archivo:
+        for inicio in range(0, max(len(df), 1), tamano_chunk):
+            parte = _preparar_parte(df.iloc[inicio:inicio + tamano_chunk], formato)
+            parte.to_csv(archivo, header=inicio == 0, index=False)
+    return len(df)
+
+
+def _escribir_parquet(df, ruta, tamano_chunk):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    try:
+        for inicio in range(0, max(len(df), 1), tamano_chunk):
+            parte = _preparar_parte(df.iloc[inicio:inicio + tamano_chunk], 'parquet')
+            # Cada parte se escribe como un row group: nunca está todo el archivo en memoria
+            tabla = pa.Table.from_pandas(parte, schema=escritor.schema if escritor else None, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(ruta, tabla.schema)
+            escritor.write_table(tabla)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    return len(df)
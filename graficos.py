@@ -0,0 +1,117 @@
+# graficos.py - Gráficos PNG de los resúmenes, renderizados en un proceso aparte y cacheados
+import asyncio
+import io
+import logging
+import multiprocessing
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from metricas import metricas
+
+# Con más categorías que esto, la torta se vuelve ilegible y se usa un gráfico de barras
+MAX_PORCIONES_TORTA = 6
+
+
+def _sin_emojis(texto):
+    """Las fuentes de matplotlib no tienen emojis: los sacamos para que no aparezcan como cuadraditos."""
+    limpio = ''.join(c for c in texto if unicodedata.category(c) not in ('So', 'Cf', 'Mn', 'Cs'))
+    return limpio.strip() or texto
+
+
+def renderizar_resumen(datos):
+    """Dibuja el gráfico de un período y devuelve el PNG en bytes.
+
+    Corre en el pool de procesos, así que recibe y devuelve solo tipos simples:
+    datos = {'titulo', 'categorias': {nombre: pesos}, 'acumulado': [(día, pesos)], 'presupuesto': pesos o None}
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    figura, (eje_categorias, eje_acumulado) = plt.subplots(1, 2, figsize=(12, 5))
+    figura.suptitle(f"Gastos de {datos['titulo']}")
+
+    nombres = [_sin_emojis(nombre) for nombre in datos['categorias']]
+    montos = list(datos['categorias'].values())
+    if len(montos) <= MAX_PORCIONES_TORTA:
+        eje_categorias.pie(montos, labels=nombres, autopct='%1.0f%%', startangle=90, counterclock=False)
+        eje_categorias.axis('equal')
+    else:
+        eje_categorias.barh(nombres[::-1], montos[::-1])
+        eje_categorias.set_xlabel('$')
+    eje_categorias.set_title('Por categoría')
+
+    dias = [dia for dia, _ in datos['acumulado']]
+    acumulado = [total for _, total in datos['acumulado']]
+    eje_acumulado.plot(dias, acumulado, label='Gastado')
+    if datos.get('presupuesto'):
+        eje_acumulado.axhline(datos['presupuesto'], color='tab:red', linestyle='--', label='Presupuesto')
+    eje_acumulado.set_title('Gasto acumulado por día')
+    eje_acumulado.set_ylabel('$')
+    eje_acumulado.legend()
+    figura.autofmt_xdate()
+    figura.tight_layout()
+
+    salida = io.BytesIO()
+    figura.savefig(salida, format='png', dpi=100)
+    plt.close(figura)
+    return salida.getvalue()
+
+
+class Graficador:
+    """Renderiza gráficos en un pool de procesos y guarda los últimos en un caché LRU.
+
+    La clave del caché incluye la versión del libro: mientras no entren gastos
+    nuevos, pedir el mismo gráfico devuelve la imagen ya generada.
+    """
+
+    def __init__(self, procesos=1, max_imagenes=64, timeout=60.0):
+        self.procesos = procesos
+        self.max_imagenes = max_imagenes
+        self.timeout = timeout
+        self._executor = None
+        self._imagenes = OrderedDict()
+        self._en_curso = {}
+
+    def _pool(self):
+        # El pool se crea con el primer gráfico: así el arranque no paga el costo de levantar procesos.
+        # 'spawn' evita heredar por fork los hilos y el event loop del proceso principal.
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.procesos, mp_context=multiprocessing.get_context('spawn')
+            )
+        return self._executor
+
+    async def obtener(self, clave, armar_datos):
+        """PNG para `clave`; armar_datos() se llama solo si hay que renderizarlo."""
+        if clave in self._imagenes:
+            metricas.contar("cache.graficos.hit")
+            self._imagenes.move_to_end(clave)
+            return self._imagenes[clave]
+
+        # Si el mismo gráfico ya se está generando, esperamos ese en lugar de renderizarlo dos veces
+        tarea = self._en_curso.get(clave)
+        if tarea is None:
+            metricas.contar("cache.graficos.miss")
+            tarea = asyncio.ensure_future(self._renderizar(clave, armar_datos()))
+            self._en_curso[clave] = tarea
+        return await asyncio.shield(tarea)
+
+    async def _renderizar(self, clave, datos):
+        try:
+            loop = asyncio.get_running_loop()
+            imagen = await asyncio.wait_for(
+                loop.run_in_executor(self._pool(), renderizar_resumen, datos), self.timeout
+            )
+        finally:
+            self._en_curso.pop(clave, None)
+        self._imagenes[clave] = imagen
+        while len(self._imagenes) > self.max_imagenes:
+            self._imagenes.popitem(last=False)
+        return imagen
+
+    def cerrar(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            logging.info("Pool de procesos de gráficos cerrado.")
@@ -1,5 +1,5 @@
 # handlers/ahorro.py
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram import Update, ReplyKeyboardRemove
 from telegram.ext import ContextTypes, ConversationHandler
 
 # Estados de la conversación
@@ -19,18 +19,11 @@ async def recibir_monto_ahorro(update: Update, context: ContextTypes.DEFAULT_TYP
     try:
         monto = float(update.message.text.replace(',', '.'))
         context.user_data['monto_pesos'] = monto
-        
-        keyboard = [
-            ['💵 Guardé Pesos', '📈 Compré Dólares'],
-            ['🏦 Invertí (PF, FCI, etc.)', 'Otro'],
-            ['❌ Cancelar']
-        ]
-        reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
-        
+
         await update.message.reply_text(
             f"Perfecto. Ahorraste {context.bot_data['bot'].formatear_pesos(monto)}.\n\n"
             "✅ ¿Qué hiciste con ese ahorro?",
-            reply_markup=reply_markup
+            reply_markup=context.bot_data['bot'].interfaz.teclado_destinos_ahorro
         )
         return DESTINO_AHORRO
         
@@ -57,7 +50,8 @@ async def recibir_destino_ahorro(update: Update, context: ContextTypes.DEFAULT_T
         bot = context.bot_data['bot']
         await bot.guardar_ahorro(
             monto_pesos=context.user_data['monto_pesos'],
-            destino=destino
+            destino=destino,
+            user_id=update.effective_user.id
         )
         
         texto_final = (
@@ -79,7 +73,8 @@ async def recibir_monto_dolares(update: Update, context: ContextTypes.DEFAULT_TY
         await bot.guardar_ahorro(
             monto_pesos=context.user_data['monto_pesos'],
             destino=context.user_data['destino'],
-            monto_dolares=monto_dolares
+            monto_dolares=monto_dolares,
+            user_id=update.effective_user.id
         )
         
         cotizacion = context.user_data['monto_pesos'] / monto_dolares
@@ -0,0 +1,86 @@
+# handlers/exportar.py
+import asyncio
+import logging
+import os
+import tempfile
+from telegram import Update
+from telegram.ext import ContextTypes
+from datetime import datetime, timedelta
+
+from exportacion import FORMATOS, escribir_archivo, parquet_disponible
+from handlers.resumen import parsear_periodo
+
+logger = logging.getLogger(__name__)
+
+HOJAS = {'gastos': 'Gastos', 'ingresos': 'Ingresos', 'ahorros': 'Ahorros'}
+
+USO_EXPORTAR = (
+    "📤 Uso de /exportar:\n"
+    "/exportar - Gastos, ingresos y ahorros del mes actual en CSV\n"
+    "/exportar gastos parquet 03/2024 - Solo una hoja, en Parquet, de un mes\n"
+    "/exportar ingresos 01/03/2024 15/04/2024 - Un rango de fechas\n"
+    "/exportar historial - Todo lo registrado\n"
+    "El período acepta lo mismo que /resumen."
+)
+
+
+async def exportar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manda las hojas pedidas como documentos CSV o Parquet."""
+    chat_id = update.message.chat_id
+    bot = context.bot_data['bot']
+
+    args = [arg.lower() for arg in context.args or []]
+    hojas = [HOJAS[arg] for arg in args if arg in HOJAS] or list(HOJAS.values())
+    formato = next((arg for arg in args if arg in FORMATOS), 'csv')
+    historial = 'historial' in args
+    resto = [arg for arg in args if arg not in HOJAS and arg not in FORMATOS and arg != 'historial']
+
+    periodo = None
+    try:
+        if historial and resto:
+            raise ValueError
+        if not historial:
+            periodo = parsear_periodo(resto, datetime.now())
+    except ValueError:
+        await context.bot.send_message(chat_id=chat_id, text=USO_EXPORTAR)
+        return
+
+    if formato == 'parquet' and not parquet_disponible():
+        await context.bot.send_message(chat_id=chat_id, text="❌ La exportación a Parquet no está disponible en este servidor. Probá con CSV.")
+        return
+
+    await context.bot.send_message(chat_id=chat_id, text="📤 Preparando la exportación... Un momento.")
+
+    try:
+        libro = await bot.libro(update.effective_user.id)
+        await libro.cargar()
+        sufijo = 'historial' if periodo is None else f"{periodo.desde:%Y%m%d}_{periodo.hasta:%Y%m%d}"
+
+        with tempfile.TemporaryDirectory() as directorio:
+            for hoja in hojas:
+                df = libro.df_gastos if hoja == 'Gastos' else await libro.leer_hoja(hoja)
+                if df is None or df.empty:
+                    await context.bot.send_message(chat_id=chat_id, text=f"🤔 {hoja}: no hay registros para exportar.")
+                    continue
+                if periodo is not None and 'Fecha' in df:
+                    # El filtro se hace en el loop (es vectorizado); el formateo y la escritura, en un hilo
+                    df = df[(df['Fecha'] >= periodo.desde) & (df['Fecha'] < periodo.hasta + timedelta(days=1))]
+                elif df is libro.df_gastos:
+                    # El loop sigue modificando df_gastos mientras el hilo escribe: le pasamos una copia tomada acá
+                    df = df.copy()
+
+                nombre_archivo = f"{hoja.lower()}_{sufijo}.{formato}"
+                ruta = os.path.join(directorio, nombre_archivo)
+                filas = await asyncio.to_thread(escribir_archivo, df, formato, ruta)
+                with open(ruta, 'rb') as archivo:
+                    await context.bot.send_document(
+                        chat_id=chat_id, document=archivo, filename=nombre_archivo,
+                        caption=f"📄 {hoja}: {filas} filas"
+                    )
+
+    except Exception as e:
+        logger.exception("Error al exportar")
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text=f"❌ ¡Ups! Hubo un error al exportar tus datos.\nError: {str(e)}"
+        )
@@ -1,4 +1,4 @@
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, InlineKeyboardMarkup, InlineKeyboardButton
+from telegram import Update, ReplyKeyboardRemove, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes, ConversationHandler
 from datetime import datetime
 
@@ -18,15 +18,9 @@ async def iniciar_gasto(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
 async def recibir_descripcion(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     descripcion = update.message.text
     context.user_data['descripcion'] = descripcion
-    # Obtenemos las llaves (categorías principales) del diccionario
-    categorias_principales = list(context.bot_data['bot'].categorias.keys())
-    # Creamos el teclado en formato de lista de listas
-    keyboard = [[cat] for cat in categorias_principales]
-    reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
-
     await update.message.reply_text(
         f"📝 Descripción: {descripcion}\n\nMarca la categoría:",
-        reply_markup=reply_markup
+        reply_markup=context.bot_data['bot'].interfaz.teclado_categorias
     )
     return CATEGORIA
 
@@ -34,17 +28,13 @@ async def recibir_categoria(update: Update, context: ContextTypes.DEFAULT_TYPE)
     categoria_seleccionada = update.message.text
     context.user_data['categoria'] = categoria_seleccionada
 
-    # Obtenemos las subcategorías del diccionario en bot.py
-    subcategorias = context.bot_data['bot'].categorias.get(categoria_seleccionada, [])
+    # Teclado de subcategorías ya armado en bot.interfaz (no hay si la categoría no tiene)
+    reply_markup = context.bot_data['bot'].interfaz.teclados_subcategorias.get(categoria_seleccionada)
 
-    if not subcategorias: # Si no hay subcategorías, se salta el paso
+    if reply_markup is None: # Si no hay subcategorías, se salta el paso
         await update.message.reply_text("💰 ¿Cerramos numeros varon?:", reply_markup=ReplyKeyboardRemove())
         return MONTO
 
-    # Creamos el teclado para las subcategorías
-    keyboard = [[sub] for sub in subcategorias]
-    reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
-
     await update.message.reply_text(
         f"📂 Categoría: {categoria_seleccionada}\n\n"
         "Selecciona la subcategoría:",
@@ -68,14 +58,12 @@ async def recibir_monto(update: Update, context: ContextTypes.DEFAULT_TYPE) -> i
         monto = float(update.message.text.replace(',', '.'))
         context.user_data['monto'] = monto
 
-        reply_markup = ReplyKeyboardMarkup(context.bot_data['bot'].metodos_pago, one_time_keyboard=True, resize_keyboard=True)
-
         await update.message.reply_text(
             f"📝 {context.user_data['descripcion']}\n"
             f"📂 {context.user_data['categoria']}\n"
             f"💰 Monto: {context.bot_data['bot'].formatear_pesos(monto)}\n\n"
             "💳 ¿Cómo pagaste?",
-            reply_markup=reply_markup
+            reply_markup=context.bot_data['bot'].interfaz.teclado_metodos
         )
         return METODO_PAGO
 
@@ -88,13 +76,8 @@ async def recibir_metodo_pago(update: Update, context: ContextTypes.DEFAULT_TYPE
     bot = context.bot_data['bot']
     user_id = update.effective_user.id
 
-    # Obtenemos la lista de métodos válidos directamente desde el bot.py
-    # Esto "aplana" la lista de listas en una sola lista para poder verificar.
-    metodos_validos = [item for sublist in bot.metodos_pago for item in sublist]
-
-    if metodo not in metodos_validos:
-        reply_markup = ReplyKeyboardMarkup(bot.metodos_pago, one_time_keyboard=True, resize_keyboard=True)
-        await update.message.reply_text("❌ Método no válido. Seleccioná uno correcto:", reply_markup=reply_markup)
+    if metodo not in bot.interfaz.metodos_validos:
+        await update.message.reply_text("❌ Método no válido. Seleccioná uno correcto:", reply_markup=bot.interfaz.teclado_metodos)
         return METODO_PAGO
 
     desc = context.user_data['descripcion']
@@ -102,7 +85,7 @@ async def recibir_metodo_pago(update: Update, context: ContextTypes.DEFAULT_TYPE
     subcat = context.user_data.get('subcategoria', '') # Obtenemos la subcategoría
     monto = context.user_data['monto']
 
-    bot.guardar_gasto(desc, cat, subcat, monto, metodo)
+    await bot.guardar_gasto(desc, cat, subcat, monto, metodo, user_id=user_id)
     fecha = datetime.now().strftime("%d/%m/%Y")
     mensaje_personalizado = bot.get_message(user_id, 'success_gasto')
 
@@ -0,0 +1,77 @@
+# handlers/grafico.py
+import calendar
+import logging
+from telegram import Update
+from telegram.ext import ContextTypes
+from datetime import datetime
+
+from handlers.resumen import parsear_periodo
+
+logger = logging.getLogger(__name__)
+
+USO_GRAFICO = (
+    "📈 Uso de /grafico (acepta los mismos períodos que /resumen):\n"
+    "/grafico - Mes actual\n"
+    "/grafico 03/2024 - Un mes\n"
+    "/grafico 01/03/2024 15/04/2024 - Un rango de fechas\n"
+    "/grafico anual 2024 - Un año"
+)
+
+
+def _es_mes_completo(periodo):
+    ultimo_dia = calendar.monthrange(periodo.desde.year, periodo.desde.month)[1]
+    return periodo.desde.day == 1 and periodo.hasta == periodo.desde.replace(day=ultimo_dia)
+
+
+async def enviar_grafico(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Manda un PNG con el gasto por categoría y el acumulado diario contra el presupuesto."""
+    chat_id = update.message.chat_id
+    bot = context.bot_data['bot']
+    user_id = update.effective_user.id
+
+    try:
+        periodo = parsear_periodo(context.args or [], datetime.now())
+    except ValueError:
+        await context.bot.send_message(chat_id=chat_id, text=USO_GRAFICO)
+        return
+
+    try:
+        libro = await bot.libro(user_id)
+        await libro.cargar()
+        if libro.df_gastos is None or libro.df_gastos.empty:
+            await context.bot.send_message(chat_id=chat_id, text="🤔 Aún no tienes gastos registrados.")
+            return
+
+        cubo = libro.cubo()
+        resumen = cubo.resumir(periodo.desde, periodo.hasta)
+        if not resumen['cantidad']:
+            await context.bot.send_message(chat_id=chat_id, text=f"👍 ¡No tienes gastos registrados en {periodo.titulo}!")
+            return
+
+        # La línea de presupuesto solo tiene sentido para un mes calendario completo
+        presupuesto = None
+        if _es_mes_completo(periodo):
+            presupuesto = sum(libro.presupuestos.get(categoria, 0.0) for categoria in bot.categorias) or None
+
+        # El acumulado llega hasta hoy: los días que todavía no pasaron no se dibujan
+        hasta = max(min(periodo.hasta, datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)), periodo.desde)
+
+        def armar_datos():
+            return {
+                'titulo': periodo.titulo,
+                'categorias': resumen['Categoría'],
+                'acumulado': cubo.acumulado_diario(periodo.desde, hasta),
+                'presupuesto': presupuesto,
+            }
+
+        await context.bot.send_chat_action(chat_id=chat_id, action='upload_photo')
+        clave = (user_id, periodo.desde, hasta, libro.version, presupuesto)
+        imagen = await bot.graficos.obtener(clave, armar_datos)
+        await context.bot.send_photo(chat_id=chat_id, photo=imagen, caption=f"📈 Gastos de {periodo.titulo}")
+
+    except Exception as e:
+        logger.exception("Error al generar gráfico")
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text=f"❌ ¡Ups! Hubo un error al generar tu gráfico.\nError: {str(e)}"
+        )
@@ -0,0 +1,103 @@
+# handlers/importar.py
+import asyncio
+import logging
+from collections import Counter
+from telegram import Update
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+# Telegram no deja a los bots descargar archivos de más de 20 MB
+TAMANO_MAXIMO = 20 * 1024 * 1024
+
+INSTRUCCIONES_IMPORTAR = (
+    "📥 Importar un extracto\n\n"
+    "Mandame el resumen de tu banco o tarjeta como archivo .csv. Tiene que tener columnas de "
+    "fecha, descripción (o concepto/detalle) y monto (o importe).\n\n"
+    "En el texto del archivo podés poner el método de pago (por ejemplo \"BBVA Crédito\"). "
+    "Las categorías se asignan solas según la descripción y los gastos que ya estén cargados no se duplican."
+)
+
+
+async def instrucciones_importar(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    await update.message.reply_text(INSTRUCCIONES_IMPORTAR)
+
+
+def _metodo_de_leyenda(leyenda, bot, normalizar_texto, defecto):
+    """Busca en el texto que acompaña al archivo alguno de los métodos de pago de config.json."""
+    if not leyenda:
+        return defecto
+    buscado = normalizar_texto(leyenda)
+    for metodo in bot.interfaz.metodos:
+        nombre = normalizar_texto(metodo)
+        if nombre and (nombre in buscado or buscado in nombre):
+            return metodo
+    return defecto
+
+
+async def importar_extracto(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Importa un CSV de gastos: parseo vectorizado, categorías automáticas, sin duplicados y en una sola escritura."""
+    chat_id = update.message.chat_id
+    bot = context.bot_data['bot']
+    documento = update.message.document
+
+    if documento.file_size and documento.file_size > TAMANO_MAXIMO:
+        await update.message.reply_text("❌ El archivo es demasiado grande (máximo 20 MB).")
+        return
+
+    await context.bot.send_message(chat_id=chat_id, text="📥 Procesando el extracto... Un momento.")
+
+    try:
+        # Como en bot._abrir_libro, pandas y la capa de datos se cargan recién cuando hacen falta
+        import importacion
+
+        archivo = await documento.get_file()
+        contenido = bytes(await archivo.download_as_bytearray())
+
+        conf_importacion = bot.config.get('importacion', {})
+        metodo = _metodo_de_leyenda(
+            update.message.caption, bot, importacion.normalizar_texto,
+            conf_importacion.get('metodo_defecto', importacion.METODO_DEFECTO)
+        )
+        reglas = importacion.reglas_de_config(bot.config)
+        gastos, descartadas, categorizadas = await asyncio.to_thread(
+            importacion.parsear_extracto, contenido, reglas, metodo,
+            conf_importacion.get('categoria_defecto', importacion.CATEGORIA_DEFECTO)
+        )
+
+        libro = await bot.libro(update.effective_user.id)
+        await libro.cargar()
+        leidos = len(gastos)
+        gastos, duplicados = importacion.filtrar_duplicados(gastos, libro.hashes_gastos())
+
+        if gastos.empty:
+            await context.bot.send_message(
+                chat_id=chat_id,
+                text=f"🤔 No hay gastos nuevos para importar ({leidos} leídos, {duplicados} ya estaban cargados)."
+            )
+            return
+
+        escrito = await libro.importar_gastos(importacion.filas_para_hoja(gastos))
+
+        por_categoria = Counter(gastos['Categoría'])
+        total = int(gastos['Centavos'].sum()) / 100
+        mensaje = (
+            f"✅ ¡Importé {len(gastos)} gastos por {bot.formatear_pesos(total)}!\n\n"
+            f"💳 Método de pago: {metodo}\n"
+            f"🔁 Duplicados omitidos: {duplicados}\n"
+            f"🚫 Filas descartadas (sin fecha/monto, pagos o devoluciones): {descartadas}\n"
+            f"🏷️ Categorizados automáticamente: {categorizadas} de {leidos}\n\n"
+        )
+        mensaje += "\n".join(f"{categoria}: {cantidad}" for categoria, cantidad in por_categoria.most_common())
+        if not escrito:
+            mensaje += "\n\n⚠️ Google Sheets no respondió: los gastos quedaron en cola y se van a reintentar."
+        await context.bot.send_message(chat_id=chat_id, text=mensaje)
+
+    except ValueError as e:
+        await context.bot.send_message(chat_id=chat_id, text=f"❌ No pude leer el extracto: {e}")
+    except Exception as e:
+        logger.exception("Error al importar extracto")
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text=f"❌ ¡Ups! Hubo un error al importar el extracto.\nError: {str(e)}"
+        )
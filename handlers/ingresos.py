@@ -1,5 +1,5 @@
 # handlers/ingresos.py
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram import Update, ReplyKeyboardRemove
 from telegram.ext import ContextTypes, ConversationHandler
 from datetime import datetime
 
@@ -9,22 +9,10 @@ from datetime import datetime
 
 async def iniciar_ingreso_rapido(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     bot = context.bot_data['bot']
-    keyboard = []
-    temp_row = []
-
-    for key, ingreso in bot.ingresos_rapidos.items():
-        temp_row.append(f"{key}")
-        if len(temp_row) == 2:
-            keyboard.append(temp_row)
-            temp_row = []
-
-    if temp_row:
-        keyboard.append(temp_row)
-    keyboard.append(['❌ Cancelar'])
 
     await update.message.reply_text(
         "💰 *Ingresos Rápidos*\n\nSelecciona el tipo de ingreso:",
-        reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True),
+        reply_markup=bot.interfaz.teclado_ingresos_rapidos,
         parse_mode='Markdown'
     )
     return INGRESO_RAPIDO
@@ -60,7 +48,7 @@ async def procesar_monto_ingreso(update: Update, context: ContextTypes.DEFAULT_T
         tipo_ingreso = context.user_data['tipo_ingreso']
         categoria = context.user_data['categoria_ingreso']
         
-        await bot.guardar_ingreso(tipo_ingreso, categoria, monto)
+        await bot.guardar_ingreso(tipo_ingreso, categoria, monto, user_id=update.effective_user.id)
         
         # await bot.actualizar_presupuesto(monto) # Comentado por ahora
         
@@ -1,24 +1,23 @@
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram import Update, ReplyKeyboardRemove
 from telegram.ext import ContextTypes, ConversationHandler
 
 CAMBIAR_MODO = 6
 
+CONFIRMACIONES = {
+    'estricto': "😤 ¡Perfecto! Seré más estricto contigo. A ahorrar.",
+    'motivador': "💪 ¡Excelente! Vamos por tus metas financieras.",
+    'comprensivo': "🤗 Genial, estaré para acompañarte sin presiones."
+}
+
 async def cambiar_modo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     bot = context.bot_data['bot']
     user_id = update.effective_user.id
     modo_actual = bot.get_user_mode(user_id)
     nombre_actual = bot.get_mode_name(user_id)
 
-    keyboard = []
-    for mode_key, mode_data in bot.personality_modes.items():
-        prefix = "✅ " if mode_key == modo_actual else ""
-        keyboard.append([f"{prefix}{mode_data['name']}"])
-    keyboard.append(['❌ Cancelar'])
-
-    reply_markup = ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True)
     await update.message.reply_text(
         f"🎭 *Cambio de Personalidad*\n\nModo actual: {nombre_actual}\n\nSelecciona tu nuevo modo:",
-        reply_markup=reply_markup,
+        reply_markup=bot.interfaz.teclado_modo(modo_actual),
         parse_mode='Markdown'
     )
     return CAMBIAR_MODO
@@ -32,11 +31,7 @@ async def procesar_cambio_modo(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.message.reply_text("❌ Cambio de modo cancelado.", reply_markup=ReplyKeyboardRemove())
         return ConversationHandler.END
 
-    modo_seleccionado = None
-    for mode_key, mode_data in bot.personality_modes.items():
-        if mode_data['name'] in seleccion:
-            modo_seleccionado = mode_key
-            break
+    modo_seleccionado = bot.interfaz.modos_por_boton.get(seleccion)
 
     if not modo_seleccionado:
         await update.message.reply_text("❌ Selección no válida. Usa /modo para intentar de nuevo.", reply_markup=ReplyKeyboardRemove())
@@ -45,14 +40,14 @@ async def procesar_cambio_modo(update: Update, context: ContextTypes.DEFAULT_TYP
     bot.set_user_mode(user_id, modo_seleccionado)
     nuevo_nombre = bot.get_mode_name(user_id)
 
-    confirmaciones = {
-        'estricto': "😤 ¡Perfecto! Seré más estricto contigo. A ahorrar.",
-        'motivador': "💪 ¡Excelente! Vamos por tus metas financieras.",
-        'comprensivo': "🤗 Genial, estaré para acompañarte sin presiones."
-    }
+    # Los modos agregados en config.json pueden traer su propio mensaje en messages.confirmacion
+    confirmacion = (
+        bot.get_message(user_id, 'confirmacion')
+        or CONFIRMACIONES.get(modo_seleccionado, "👌 Listo, a partir de ahora te hablo así.")
+    )
 
     await update.message.reply_text(
-        f"✅ *Modo cambiado exitosamente*\n\nNuevo modo: {nuevo_nombre}\n\n{confirmaciones[modo_seleccionado]}",
+        f"✅ *Modo cambiado exitosamente*\n\nNuevo modo: {nuevo_nombre}\n\n{confirmacion}",
         reply_markup=ReplyKeyboardRemove()
     )
     return ConversationHandler.END
@@ -1,5 +1,5 @@
 # handlers/rapido.py
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from datetime import datetime
 
@@ -7,24 +7,27 @@ from datetime import datetime
 # Los estados ahora coinciden con los definidos en main.py
 (GASTO_RAPIDO, METODO_PAGO_RAPIDO) = range(5, 7)
 
+MENSAJE_DUPLICADO = "☑️ Ese gasto ya estaba registrado, no lo guardé de nuevo."
+
 async def iniciar_gasto_rapido(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     bot = context.bot_data['bot']
-    keyboard = []
-    temp_row = []
-
-    for key, gasto in bot.gastos_rapidos.items():
-        temp_row.append(f"{key} {bot.formatear_pesos(gasto['monto'])}")
-        if len(temp_row) == 2:
-            keyboard.append(temp_row)
-            temp_row = []
 
-    if temp_row:
-        keyboard.append(temp_row)
-    keyboard.append(['❌ Cancelar'])
+    # Arriba, los gastos que más repite el usuario (con su método de pago habitual): un toque y listo.
+    # El ranking ya está calculado en el libro; acá solo se lee.
+    user_id = update.effective_user.id
+    libro = bot.tenants.libro_abierto(user_id)
+    if libro is not None and libro.cache_gastos.cargado:
+        teclado, frecuentes = bot.interfaz.teclado_gastos_frecuentes(libro.frecuentes.top)
+    else:
+        # Sin caché todavía (arranque en frío o Sheets caído): el menú de config.json no espera a
+        # Google, y el libro se carga en segundo plano para la próxima vez
+        teclado, frecuentes = bot.interfaz.teclado_gastos_rapidos, {}
+        context.application.create_task(bot.precalentar(user_id))
+    context.user_data['gastos_frecuentes'] = frecuentes
 
     await update.message.reply_text(
         "⚡ *Gastos rápidos*\n\nSelecciona un gasto frecuente para registrarlo:",
-        reply_markup=ReplyKeyboardMarkup(keyboard, one_time_keyboard=True, resize_keyboard=True),
+        reply_markup=teclado,
         parse_mode='Markdown'
     )
     return GASTO_RAPIDO
@@ -38,42 +41,52 @@ async def procesar_gasto_rapido(update: Update, context: ContextTypes.DEFAULT_TY
         await update.message.reply_text("❌ Operación cancelada.", reply_markup=menu_markup)
         return ConversationHandler.END
 
-    for key, gasto in bot.gastos_rapidos.items():
-        if seleccion.startswith(key):
-            context.user_data['gasto_rapido'] = gasto
-            break
-    else:
+    frecuente = context.user_data.get('gastos_frecuentes', {}).get(seleccion)
+    if frecuente is not None:
+        return await _registrar_gasto_rapido(update, context, frecuente, frecuente['metodo'])
+
+    gasto = bot.interfaz.gastos_rapidos_por_boton.get(seleccion)
+    if gasto is None:
         await update.message.reply_text("❌ Selección no válida. Intenta de nuevo.", reply_markup=menu_markup)
         return ConversationHandler.END
+    context.user_data['gasto_rapido'] = gasto
 
-    reply_markup = ReplyKeyboardMarkup(bot.metodos_pago, one_time_keyboard=True, resize_keyboard=True)
-    await update.message.reply_text("💳 ¿Cómo pagaste?", reply_markup=reply_markup)
+    await update.message.reply_text("💳 ¿Cómo pagaste?", reply_markup=bot.interfaz.teclado_metodos)
     return METODO_PAGO_RAPIDO
 
 async def procesar_metodo_pago_rapido(update: Update, context: ContextTypes.DEFAULT_TYPE):
     metodo = update.message.text
     bot = context.bot_data['bot']
     gasto = context.user_data.get('gasto_rapido')
-    menu_markup = context.bot_data.get('menu_markup')
-    
-    metodos_validos = [item for sublist in bot.metodos_pago for item in sublist]
-    if metodo not in metodos_validos:
-        reply_markup = ReplyKeyboardMarkup(bot.metodos_pago, one_time_keyboard=True, resize_keyboard=True)
-        await update.message.reply_text("❌ Método no válido. Seleccioná uno correcto:", reply_markup=reply_markup)
+
+    if metodo not in bot.interfaz.metodos_validos:
+        await update.message.reply_text("❌ Método no válido. Seleccioná uno correcto:", reply_markup=bot.interfaz.teclado_metodos)
         return METODO_PAGO_RAPIDO
 
-    await bot.guardar_gasto(
-        gasto['descripcion'],
-        gasto['categoria'],
-        gasto['subcategoria'],
-        gasto['monto'],
-        metodo
-    )
+    return await _registrar_gasto_rapido(update, context, gasto, metodo)
+
+async def _registrar_gasto_rapido(update: Update, context: ContextTypes.DEFAULT_TYPE, gasto, metodo):
+    bot = context.bot_data['bot']
+    menu_markup = context.bot_data.get('menu_markup')
+
+    datos = (gasto['descripcion'], gasto['categoria'], gasto.get('subcategoria', ''), gasto['monto'], metodo)
+    if bot.duplicados.es_duplicado(update, *datos):
+        # Update reenviado o doble toque: el gasto ya se guardó con el primero
+        await update.message.reply_text(MENSAJE_DUPLICADO, reply_markup=menu_markup)
+        context.user_data.clear()
+        return ConversationHandler.END
+
+    try:
+        await bot.guardar_gasto(*datos, user_id=update.effective_user.id)
+    except Exception:
+        # No se guardó: si el usuario reintenta, no es un duplicado
+        bot.duplicados.olvidar(update, *datos)
+        raise
 
     fecha = datetime.now().strftime("%d/%m/%Y")
     texto_final = (
         f"⚡ ¡Gasto rápido registrado!\n\n"
-        f"📅 {fecha}\n📝 {gasto['descripcion']}\n📂 {gasto['categoria']} -> {gasto['subcategoria']}\n"
+        f"📅 {fecha}\n📝 {gasto['descripcion']}\n📂 {gasto['categoria']} -> {gasto.get('subcategoria', '')}\n"
         f"💰 {bot.formatear_pesos(gasto['monto'])}\n💳 {metodo}\n\n"
         "Para continuar, usa /menu o elige una opción."
     )
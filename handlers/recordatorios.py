@@ -1,99 +1,195 @@
 # handlers/recordatorios.py
 import asyncio
-from datetime import datetime, time
+import heapq
+import itertools
+import logging
+import re
+import time as reloj
+from datetime import datetime, time, timedelta
 from telegram import Update
 from telegram.ext import ContextTypes
 import pytz
+from difusion import Difusor
 
 class RecordatorioManager:
+    """Programa los recordatorios en una cola de prioridad ordenada por hora y duerme hasta el próximo."""
+
     def __init__(self, application):
         self.application = application
-        self.timezone = pytz.timezone('America/Argentina/Buenos_Aires')
-        self.recordatorios_activos = {}
-        
-    
+        # Heap de (momento_unix, secuencia, chat_id, hora, tipo, versión); tipo es 'almuerzo' o 'noche'
+        self._agenda = []
+        self._secuencia = itertools.count()
+        # Versión vigente de la agenda de cada chat: las entradas viejas se descartan al salir del heap
+        self._versiones = {}
+        self._cambio = asyncio.Event()
+
+        bot = application.bot_data.get('bot')
+        conf_difusion = bot.config.get('difusion', {}) if bot else {}
+        self.difusor = Difusor(
+            application.bot,
+            mensajes_por_segundo=conf_difusion.get('mensajes_por_segundo', 25),
+            intervalo_por_chat=conf_difusion.get('intervalo_por_chat', 1.0),
+            concurrencia=conf_difusion.get('concurrencia', 20),
+            al_bloquear=self._desuscribir,
+        )
+
+    def _desuscribir(self, chat_id):
+        """Saca de los recordatorios a un chat que bloqueó al bot."""
+        bot = self.application.bot_data.get('bot')
+        if bot:
+            bot.remover_chat_recordatorio(chat_id)
+            self.reprogramar(chat_id)
+
+    def _proximo_momento(self, hora, zona):
+        """Momento (unix) de la próxima vez que el reloj de `zona` marque `hora` (HH:MM)."""
+        tz = pytz.timezone(zona)
+        horas, minutos = map(int, hora.split(':'))
+        ahora = datetime.now(tz)
+        fecha = ahora.date()
+        while True:
+            candidato = tz.localize(datetime.combine(fecha, time(horas, minutos)))
+            if candidato > ahora:
+                return candidato.timestamp()
+            fecha += timedelta(days=1)
+
+    def reprogramar(self, chat_id):
+        """Recalcula la agenda de un chat (al activar, cambiar o desactivar sus recordatorios)."""
+        bot = self.application.bot_data.get('bot')
+        version = self._versiones.get(chat_id, 0) + 1
+        self._versiones[chat_id] = version
+
+        config = bot.chat_recordatorios.get(chat_id) if bot else None
+        if config:
+            for hora, tipo in self._tipos(config['horas']):
+                self._agendar(chat_id, hora, tipo, config['zona'], version)
+        self._cambio.set()
+
+    @staticmethod
+    def _tipos(horas):
+        """Empareja cada hora con su mensaje: la última del día es la de la noche y las anteriores, las del mediodía."""
+        ultima = max(horas, key=lambda hora: tuple(map(int, hora.split(':'))))
+        return [(hora, 'noche' if hora == ultima else 'almuerzo') for hora in horas]
+
+    def _agendar(self, chat_id, hora, tipo, zona, version):
+        momento = self._proximo_momento(hora, zona)
+        heapq.heappush(self._agenda, (momento, next(self._secuencia), chat_id, hora, tipo, version))
+
+    def _vigente(self, entrada):
+        _, _, chat_id, _, _, version = entrada
+        return self._versiones.get(chat_id) == version
+
     async def loop_recordatorios(self):
-        """Loop principal para enviar recordatorios"""
+        """Loop principal: duerme exactamente hasta el próximo recordatorio o hasta que cambie la agenda."""
+        bot = self.application.bot_data.get('bot')
+        if bot:
+            for chat_id in list(bot.chat_recordatorios):
+                try:
+                    self.reprogramar(chat_id)
+                except Exception:
+                    logging.exception(f"No se pudieron agendar los recordatorios del chat {chat_id}")
+
         while True:
-            await asyncio.sleep(60)  # Revisar cada minuto
-            
-            ahora = datetime.now(self.timezone)
-            hora_actual = ahora.time()
-            
-            # Recordatorio de las 13:00
-            if hora_actual.hour == 13 and hora_actual.minute == 0:
-                await self.enviar_recordatorio_almuerzo()
-            
-            # Recordatorio de las 22:00
-            if hora_actual.hour == 22 and hora_actual.minute == 0:
-                await self.enviar_recordatorio_noche()
+            try:
+                await self._atender_agenda(bot)
+            except Exception:
+                # Un recordatorio roto no puede dejar sin recordatorios a todos los demás
+                logging.exception("Error en el loop de recordatorios")
+                await asyncio.sleep(1)
+
+    async def _atender_agenda(self, bot):
+        """Una vuelta del loop: espera al próximo recordatorio o dispara los vencidos."""
+        # Descartamos entradas de agendas que ya se reprogramaron
+        while self._agenda and not self._vigente(self._agenda[0]):
+            heapq.heappop(self._agenda)
+
+        espera = self._agenda[0][0] - reloj.time() if self._agenda else None
+        if espera is None or espera > 0:
+            self._cambio.clear()
+            try:
+                await asyncio.wait_for(self._cambio.wait(), timeout=espera)
+            except asyncio.TimeoutError:
+                pass
+            return
+
+        # Juntamos todos los recordatorios vencidos y los reagendamos para el día siguiente
+        ahora = reloj.time()
+        vencidos = {}
+        while self._agenda and self._agenda[0][0] <= ahora:
+            entrada = heapq.heappop(self._agenda)
+            if not self._vigente(entrada):
+                continue
+            _, _, chat_id, hora, tipo, version = entrada
+            try:
+                self._agendar(chat_id, hora, tipo, bot.chat_recordatorios[chat_id]['zona'], version)
+                vencidos.setdefault(tipo, []).append(chat_id)
+            except Exception:
+                logging.exception(f"Recordatorio inválido del chat {chat_id} ({hora}): se descarta")
+
+        # Las difusiones corren aparte para que una tanda grande no atrase la agenda
+        if vencidos.get('almuerzo'):
+            self.application.create_task(self.enviar_recordatorio_almuerzo(vencidos['almuerzo']))
+        if vencidos.get('noche'):
+            self.application.create_task(self.enviar_recordatorio_noche(vencidos['noche']))
     
-    async def enviar_recordatorio_almuerzo(self):
+    async def enviar_recordatorio_almuerzo(self, chat_ids):
         """Envía recordatorio del mediodía"""
-        bot = self.application.bot_data.get('bot')
-        if not bot:
-            return
-            
         mensaje = (
             "🍽️ *Recordatorio del mediodía*\n\n"
             "¿Ya almorzaste? No olvides registrar tus gastos de la mañana.\n\n"
             "Usa: /gasto, /rapido, /ingreso"
         )
-        
-        for chat_id in bot.chat_recordatorios:
-            try:
-                await self.application.bot.send_message(
-                    chat_id=chat_id,
-                    text=mensaje,
-                    parse_mode='Markdown'
-                )
-            except Exception as e:
-                print(f"Error enviando recordatorio a {chat_id}: {e}")
+        await self.difusor.difundir(chat_ids, mensaje, nombre='recordatorio_almuerzo', parse_mode='Markdown')
     
-    async def enviar_recordatorio_noche(self):
+    async def enviar_recordatorio_noche(self, chat_ids):
         """Envía recordatorio de la noche"""
-        bot = self.application.bot_data.get('bot')
-        if not bot:
-            return
-            
         mensaje = (
             "🌙 *Recordatorio nocturno*\n\n"
             "Antes de dormir, ¿registraste todos los gastos del día?\n\n"
             "Usa: /gasto, /rapido, /resumen"
         )
-        
-        for chat_id in bot.chat_recordatorios:
-            try:
-                await self.application.bot.send_message(
-                    chat_id=chat_id,
-                    text=mensaje,
-                    parse_mode='Markdown'
-                )
-            except Exception as e:
-                print(f"Error enviando recordatorio a {chat_id}: {e}")
+        await self.difusor.difundir(chat_ids, mensaje, nombre='recordatorio_noche', parse_mode='Markdown')
 
 # handlers/configuracion.py
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
 from telegram.ext import ContextTypes
 
 async def toggle_recordatorios(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Activa/desactiva recordatorios para el usuario"""
+    """Activa/desactiva recordatorios. Con argumentos (/recordatorios 09:00 21:30 [zona]) configura horarios."""
     bot = context.bot_data['bot']
+    manager = context.bot_data.get('recordatorios')
     chat_id = update.effective_chat.id
-    
-    if chat_id in bot.chat_recordatorios:
+    args = context.args or []
+
+    if not args and chat_id in bot.chat_recordatorios:
         bot.remover_chat_recordatorio(chat_id)
+        if manager:
+            manager.reprogramar(chat_id)
         await update.message.reply_text(
             "🔕 Recordatorios desactivados.\n\n"
             "Para reactivarlos, usa /recordatorios"
         )
-    else:
-        bot.agregar_chat_recordatorio(chat_id)
+        return
+
+    horas = [arg for arg in args if re.fullmatch(r'([01]?\d|2[0-3]):[0-5]\d', arg)]
+    zonas = [arg for arg in args if arg not in horas]
+    zona = zonas[0] if zonas else None
+    if zona and zona not in pytz.all_timezones_set:
         await update.message.reply_text(
-            "🔔 ¡Recordatorios activados!\n\n"
-            "Te recordaré registrar tus gastos a las 13:00 y 22:00.\n\n"
-            "Para desactivarlos, usa /recordatorios nuevamente"
+            f"❌ No conozco la zona horaria '{zona}'.\n"
+            "Ejemplo: /recordatorios 13:00 22:00 America/Argentina/Buenos_Aires"
         )
+        return
+
+    bot.agregar_chat_recordatorio(chat_id, horas=horas or None, zona=zona)
+    if manager:
+        manager.reprogramar(chat_id)
+    config = bot.chat_recordatorios[chat_id]
+    await update.message.reply_text(
+        "🔔 ¡Recordatorios activados!\n\n"
+        f"Te recordaré registrar tus gastos a las {' y '.join(config['horas'])} ({config['zona']}).\n\n"
+        "Para cambiar los horarios: /recordatorios 09:00 21:30 [zona horaria]\n"
+        "Para desactivarlos, usa /recordatorios nuevamente"
+    )
 
 async def configurar_presupuesto(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Muestra información sobre cómo configurar presupuestos"""
@@ -1,62 +1,196 @@
 # handlers/resumen.py
-import pandas as pd
+import calendar
+import re
 from telegram import Update
 from telegram.ext import ContextTypes
-from datetime import datetime
-import locale
+from datetime import datetime, timedelta
+
+MESES = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
+         'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
+
+USO_RESUMEN = (
+    "📊 Uso de /resumen:\n"
+    "/resumen - Mes actual\n"
+    "/resumen 03/2024 o /resumen marzo 2024 - Un mes\n"
+    "/resumen 01/03/2024 15/04/2024 - Un rango de fechas\n"
+    "/resumen anual 2024 - Un año, mes a mes"
+)
+
+# Cuántas filas mostrar como máximo en cada desglose largo
+MAX_SUBCATEGORIAS = 10
+MAX_MESES = 24
+
+
+class Periodo:
+    """Rango de días (inclusive) que se resume, con el período anterior de igual duración para comparar."""
+
+    def __init__(self, desde, hasta, titulo, anterior, mensual=False, mes=None, mes_anterior=None):
+        self.desde = desde
+        self.hasta = hasta
+        self.titulo = titulo
+        self.anterior = anterior
+        # Si es True se muestra la evolución mes a mes
+        self.mensual = mensual
+        # (año, mes) si el período es un mes calendario: sale directo del índice mensual del libro
+        self.mes = mes
+        self.mes_anterior = mes_anterior
+
+
+def _periodo_mes(año, mes):
+    ultimo_dia = calendar.monthrange(año, mes)[1]
+    año_ant, mes_ant = (año - 1, 12) if mes == 1 else (año, mes - 1)
+    anterior = (datetime(año_ant, mes_ant, 1), datetime(año_ant, mes_ant, calendar.monthrange(año_ant, mes_ant)[1]))
+    return Periodo(
+        datetime(año, mes, 1), datetime(año, mes, ultimo_dia), f"{MESES[mes - 1]} {año}", anterior,
+        mes=(año, mes), mes_anterior=(año_ant, mes_ant),
+    )
+
+
+def _periodo_anual(año):
+    anterior = (datetime(año - 1, 1, 1), datetime(año - 1, 12, 31))
+    return Periodo(datetime(año, 1, 1), datetime(año, 12, 31), f"{año}", anterior, mensual=True)
+
+
+def _periodo_rango(desde, hasta):
+    if hasta < desde:
+        desde, hasta = hasta, desde
+    duracion = hasta - desde
+    anterior = (desde - duracion - timedelta(days=1), desde - timedelta(days=1))
+    titulo = f"{desde.strftime('%d/%m/%Y')} al {hasta.strftime('%d/%m/%Y')}"
+    mensual = (desde.year, desde.month) != (hasta.year, hasta.month)
+    return Periodo(desde, hasta, titulo, anterior, mensual=mensual)
+
+
+def parsear_periodo(args, hoy):
+    """Interpreta los argumentos de /resumen. Lanza ValueError si no se entienden."""
+    args = [arg.strip().lower() for arg in args if arg.strip()]
+    if not args:
+        return _periodo_mes(hoy.year, hoy.month)
+
+    if args[0] == 'anual':
+        if len(args) > 2:
+            raise ValueError
+        return _periodo_anual(int(args[1]) if len(args) == 2 else hoy.year)
+
+    if len(args) == 2 and all(re.fullmatch(r'\d{1,2}/\d{1,2}/\d{4}', arg) for arg in args):
+        return _periodo_rango(*(datetime.strptime(arg, '%d/%m/%Y') for arg in args))
+
+    nombres = [nombre.lower() for nombre in MESES]
+    if args[0] in nombres and len(args) <= 2:
+        mes = nombres.index(args[0]) + 1
+        año = int(args[1]) if len(args) == 2 else hoy.year
+        return _periodo_mes(año, mes)
+
+    if len(args) == 1:
+        coincidencia = re.fullmatch(r'(\d{1,2})/(\d{4})', args[0]) or re.fullmatch(r'(\d{4})-(\d{1,2})', args[0])
+        if coincidencia:
+            a, b = (int(grupo) for grupo in coincidencia.groups())
+            año, mes = (b, a) if '/' in args[0] else (a, b)
+            if 1 <= mes <= 12:
+                return _periodo_mes(año, mes)
+    raise ValueError
+
+
+def _variacion(actual, anterior):
+    if not anterior:
+        return "nuevo" if actual else "="
+    cambio = (actual - anterior) / anterior * 100
+    flecha = "▲" if cambio > 0 else "▼" if cambio < 0 else "="
+    return f"{flecha}{abs(cambio):.0f}%"
+
+
+def _meses_entre(desde, hasta):
+    """Lista de (año, mes) desde el mes de `desde` hasta el de `hasta`, inclusive."""
+    meses = []
+    año, mes = desde.year, desde.month
+    while (año, mes) <= (hasta.year, hasta.month):
+        meses.append((año, mes))
+        año, mes = (año + 1, 1) if mes == 12 else (año, mes + 1)
+    return meses
+
+
+def armar_mensaje(bot, periodo, resumen, resumen_anterior, meses):
+    """Texto Markdown del resumen; las variaciones son contra el período anterior de igual duración.
+
+    meses: lista de ((año, mes), total, total del mes previo) para la evolución mes a mes.
+    """
+    mensaje = f"📊 *Resumen de Gastos de {periodo.titulo}*\n\n"
+
+    mensaje += "*Por categoría* (vs. período anterior):\n"
+    anteriores = resumen_anterior['Categoría']
+    for categoria, monto in resumen['Categoría'].items():
+        mensaje += f"_{categoria}_: `{bot.formatear_pesos(monto)}` ({_variacion(monto, anteriores.get(categoria, 0))})\n"
+
+    mensaje += "\n*Subcategorías principales:*\n"
+    for subcategoria, monto in list(resumen['Subcategoría'].items())[:MAX_SUBCATEGORIAS]:
+        mensaje += f"{subcategoria or 'Sin subcategoría'}: `{bot.formatear_pesos(monto)}`\n"
+
+    mensaje += "\n*Por método de pago:*\n"
+    for metodo, monto in resumen['Metodo_Pago'].items():
+        mensaje += f"{metodo or 'Sin especificar'}: `{bot.formatear_pesos(monto)}`\n"
+
+    if meses:
+        mensaje += "\n*Mes a mes:*\n"
+        for (año, mes), monto, monto_previo in meses[-MAX_MESES:]:
+            mensaje += f"{MESES[mes - 1][:3]} {año}: `{bot.formatear_pesos(monto)}` ({_variacion(monto, monto_previo)})\n"
+
+    mensaje += "\n---------------------\n"
+    mensaje += (
+        f"*Total Gastado:* `{bot.formatear_pesos(resumen['total'])}` en {resumen['cantidad']} gastos "
+        f"({_variacion(resumen['total'], resumen_anterior['total'])} vs. "
+        f"`{bot.formatear_pesos(resumen_anterior['total'])}`)"
+    )
+    mensaje += "\n\nPara continuar, usa: /gasto, /rapido, /resumen, /modo"
+    return mensaje
+
 
 async def generar_resumen(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.message.chat_id
     bot = context.bot_data['bot']
-    
-    # ... (El código de locale se mantiene igual) ...
+
     try:
-        locale.setlocale(locale.LC_TIME, 'es_ES.UTF-8')
-    except locale.Error:
-        try:
-            locale.setlocale(locale.LC_TIME, 'es_AR.UTF-8')
-        except locale.Error:
-            pass
+        periodo = parsear_periodo(context.args or [], datetime.now())
+    except ValueError:
+        await context.bot.send_message(chat_id=chat_id, text=USO_RESUMEN)
+        return
 
     await context.bot.send_message(chat_id=chat_id, text="📊 Analizando tus gastos... Un momento.")
 
     try:
         ### MODIFICADO: Usamos el sistema de caché ###
-        await bot._cargar_datos() # Aseguramos que los datos estén cargados
-        df = bot.df_gastos
+        libro = await bot.libro(update.effective_user.id)
+        await libro.cargar() # Aseguramos que los datos estén cargados
+        df = libro.df_gastos
 
         if df is None or df.empty:
             await context.bot.send_message(chat_id=chat_id, text="🤔 Aún no tienes gastos registrados.")
             return
 
-        mes_actual = datetime.now().month
-        año_actual = datetime.now().year
-        df_mes_actual = df[(df['Fecha'].dt.month == mes_actual) & (df['Fecha'].dt.year == año_actual)]
+        if periodo.mes:
+            # Un mes calendario sale del índice mensual, que se mantiene con cada gasto:
+            # no hace falta recalcular el cubo después de cada escritura
+            resumen = libro.indice.resumir_mes(*periodo.mes)
+            resumen_anterior = libro.indice.resumir_mes(*periodo.mes_anterior)
+        else:
+            # Rangos y años salen del cubo de agregados, que solo se recalcula cuando cambian los gastos
+            cubo = libro.cubo()
+            resumen = cubo.resumir(periodo.desde, periodo.hasta)
+            resumen_anterior = cubo.resumir(*periodo.anterior)
 
-        if df_mes_actual.empty:
-            await context.bot.send_message(chat_id=chat_id, text="👍 ¡No tienes gastos registrados en lo que va del mes!")
+        if not resumen['cantidad']:
+            await context.bot.send_message(chat_id=chat_id, text=f"👍 ¡No tienes gastos registrados en {periodo.titulo}!")
             return
 
-        resumen_por_categoria = df_mes_actual.groupby('Categoría')['Monto'].sum().sort_values(ascending=False)
-        total_gastado = df_mes_actual['Monto'].sum()
-
-        # ... (El resto del código para generar el mensaje se mantiene igual) ...
-        try:
-            nombre_mes = datetime.now().strftime('%B').capitalize()
-        except:
-            meses = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio',
-                    'Julio', 'Agosto', 'Septiembre', 'Octubre', 'Noviembre', 'Diciembre']
-            nombre_mes = meses[datetime.now().month - 1]
-
-        mensaje = f"📊 *Resumen de Gastos de {nombre_mes}*\n\n"
-        
-        for categoria, monto in resumen_por_categoria.items():
-            mensaje += f"_{categoria}_: `{bot.formatear_pesos(monto)}`\n"
-        
-        mensaje += "\n---------------------\n"
-        mensaje += f"*Total Gastado:* `{bot.formatear_pesos(total_gastado)}`"
-        mensaje += "\n\nPara continuar, usa: /gasto, /rapido, /resumen, /modo"
-        
+        meses = []
+        if periodo.mensual:
+            # Incluimos el mes previo al período para calcular la variación del primer mes
+            inicio_mes_previo = (periodo.desde.replace(day=1) - timedelta(days=1)).replace(day=1)
+            hasta = min(periodo.hasta, datetime.now())
+            totales = cubo.totales_por_mes(inicio_mes_previo, hasta)
+            serie = _meses_entre(inicio_mes_previo, hasta)
+            meses = [(actual, totales.get(actual, 0), totales.get(previo, 0)) for previo, actual in zip(serie, serie[1:])]
+
+        mensaje = armar_mensaje(bot, periodo, resumen, resumen_anterior, meses)
         await context.bot.send_message(chat_id=chat_id, text=mensaje, parse_mode='Markdown')
 
     except Exception as e:
@@ -0,0 +1,57 @@
+# handlers/stats.py
+from telegram import Update
+from telegram.constants import MessageLimit
+from telegram.ext import ContextTypes
+from metricas import metricas
+
+def _en_partes(texto, limite=MessageLimit.MAX_TEXT_LENGTH):
+    """Corta el texto en mensajes de a lo sumo `limite` caracteres, sin partir líneas si se puede."""
+    partes, actual = [], ""
+    for linea in texto.split("\n"):
+        while len(linea) > limite:
+            if actual:
+                partes.append(actual)
+                actual = ""
+            partes.append(linea[:limite])
+            linea = linea[limite:]
+        if actual and len(actual) + 1 + len(linea) > limite:
+            partes.append(actual)
+            actual = linea
+        else:
+            actual = f"{actual}\n{linea}" if actual else linea
+    if actual:
+        partes.append(actual)
+    return partes
+
+async def mostrar_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Muestra las métricas del proceso (solo para administradores)."""
+    bot = context.bot_data['bot']
+    if update.effective_user.id not in bot.admin_ids:
+        await update.message.reply_text("⛔ Este comando es solo para administradores.")
+        return
+
+    conf_sheets = bot.config.get('sheets', {})
+    mensaje = metricas.reporte(
+        cuota_lecturas=conf_sheets.get('cuota_lecturas_por_minuto', 60),
+        cuota_escrituras=conf_sheets.get('cuota_escrituras_por_minuto', 60),
+    )
+
+    mensaje += "\n\n📬 Colas de escritura (pendientes / filas / lotes / errores / última latencia):"
+    for stats in bot.estadisticas_escritura():
+        mensaje += (
+            f"\n  {stats['hoja']} ({stats['spreadsheet']}): {stats['profundidad']} / {stats['filas_escritas']} / "
+            f"{stats['lotes_escritos']} / {stats['errores']} / {stats['ultima_latencia']:.2f}s"
+        )
+
+    memoria_mb = bot.tenants.memoria_total() / (1024 * 1024)
+    mensaje += f"\n\n👥 Libros abiertos: {len(bot.tenants.libros_abiertos)} ({memoria_mb:.1f} MB estimados)"
+
+    vigilante = bot.vigilante_config
+    mensaje += f"\n🔄 config.json: {vigilante.recargas} recargas, {vigilante.errores} rechazadas"
+    if vigilante.ultimo_error:
+        mensaje += f"\n  Último error: {vigilante.ultimo_error}"
+
+    # Texto plano: los nombres con guiones bajos romperían el Markdown.
+    # Con muchos libros o contadores el reporte supera el límite de Telegram, así que va en partes
+    for parte in _en_partes(mensaje):
+        await update.message.reply_text(parte)
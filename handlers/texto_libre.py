@@ -0,0 +1,85 @@
+# handlers/texto_libre.py
+from telegram import Update
+from telegram.ext import ContextTypes
+from datetime import datetime
+
+from handlers.rapido import MENSAJE_DUPLICADO
+
+
+async def registrar_texto_libre(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Registra un gasto escrito en una línea ('chino 3500 mp'). Si falta algo, lo pregunta y aprende el alias."""
+    texto = update.message.text
+    bot = context.bot_data['bot']
+    user_id = update.effective_user.id
+    indice = bot.entrada_rapida
+
+    pendiente = context.user_data.pop('entrada_pendiente', None)
+    entrada = None
+    if pendiente:
+        # Es la respuesta a lo que preguntamos: la usamos y recordamos el alias para la próxima
+        entrada = pendiente['entrada']
+        if pendiente['falta'] == 'gasto' and texto in indice.gastos_por_etiqueta:
+            entrada.gasto = indice.gastos_por_etiqueta[texto]
+            if entrada.alias_gasto:
+                bot.aprender_alias(user_id, entrada.alias_gasto, texto)
+        elif pendiente['falta'] == 'metodo' and texto in bot.interfaz.metodos_validos:
+            entrada.metodo = texto
+            if entrada.alias_metodo:
+                bot.aprender_alias(user_id, entrada.alias_metodo, texto)
+        else:
+            entrada = None
+    if entrada is None:
+        entrada = indice.interpretar(texto, bot.alias_de(user_id))
+        if entrada is None:
+            return
+
+    if entrada.gasto is None:
+        context.user_data['entrada_pendiente'] = {'entrada': entrada, 'falta': 'gasto'}
+        if entrada.candidatos_gasto:
+            teclado = bot.interfaz.teclado_de(destino.etiqueta for destino in entrada.candidatos_gasto)
+        else:
+            teclado = bot.interfaz.teclado_opciones_gasto
+        await update.message.reply_text(
+            f"🤔 ¿A qué corresponde \"{entrada.alias_gasto}\"? Elegí una opción y me lo acuerdo para la próxima:",
+            reply_markup=teclado
+        )
+        return
+
+    if entrada.metodo is None:
+        context.user_data['entrada_pendiente'] = {'entrada': entrada, 'falta': 'metodo'}
+        candidatos = entrada.candidatos_metodo
+        if candidatos and len(candidatos) < len(bot.interfaz.metodos):
+            teclado = bot.interfaz.teclado_de(candidatos)
+        else:
+            teclado = bot.interfaz.teclado_metodos
+        await update.message.reply_text(
+            f"📝 {entrada.descripcion} - {bot.formatear_pesos(entrada.monto)}\n\n💳 ¿Cómo pagaste?",
+            reply_markup=teclado
+        )
+        return
+
+    gasto = entrada.gasto
+    if bot.duplicados.es_duplicado(update, entrada.descripcion, gasto.categoria, gasto.subcategoria, entrada.monto, entrada.metodo):
+        await update.message.reply_text(MENSAJE_DUPLICADO, reply_markup=context.bot_data.get('menu_markup'))
+        return
+
+    try:
+        await bot.guardar_gasto(
+            entrada.descripcion, gasto.categoria, gasto.subcategoria, entrada.monto, entrada.metodo, user_id=user_id
+        )
+    except Exception:
+        # No se guardó: si el usuario reintenta, no es un duplicado
+        bot.duplicados.olvidar(update, entrada.descripcion, gasto.categoria, gasto.subcategoria, entrada.monto, entrada.metodo)
+        raise
+    alerta_presupuesto = await bot.verificar_presupuesto(gasto.categoria, gasto.subcategoria, user_id)
+
+    fecha = datetime.now().strftime("%d/%m/%Y")
+    texto_final = (
+        f"✅ ¡Gasto registrado!\n\n"
+        f"📅 {fecha}\n📝 {entrada.descripcion}\n📂 {gasto.categoria} -> {gasto.subcategoria}\n"
+        f"💰 {bot.formatear_pesos(entrada.monto)}\n💳 {entrada.metodo}\n\n"
+        f"{bot.get_message(user_id, 'success_gasto')}\n"
+    )
+    if alerta_presupuesto:
+        texto_final += f"\n{alerta_presupuesto}\n"
+    await update.message.reply_text(texto_final, reply_markup=context.bot_data.get('menu_markup'))
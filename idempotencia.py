@@ -0,0 +1,73 @@
+# idempotencia.py - Descarte de updates repetidos y dobles toques antes de escribir en Sheets
+import time
+from collections import OrderedDict
+
+from metricas import metricas
+
+
+class CacheExpirable:
+    """Claves que vencen `ttl` segundos después de agregarse, con a lo sumo `max_claves` a la vez.
+
+    Como todas duran lo mismo, el orden de inserción es también el de vencimiento:
+    las vencidas (o las que sobran) siempre están al principio.
+    """
+
+    def __init__(self, ttl, max_claves):
+        self.ttl = ttl
+        self.max_claves = max_claves
+        self._claves = OrderedDict()
+
+    def _purgar(self, ahora):
+        while self._claves and next(iter(self._claves.values())) <= ahora:
+            self._claves.popitem(last=False)
+
+    def visto(self, clave):
+        """True si la clave se agregó hace menos de `ttl` segundos; si no, la agrega y devuelve False."""
+        ahora = time.monotonic()
+        self._purgar(ahora)
+        if clave in self._claves:
+            return True
+        self._claves[clave] = ahora + self.ttl
+        if len(self._claves) > self.max_claves:
+            self._claves.popitem(last=False)
+        return False
+
+    def descartar(self, clave):
+        self._claves.pop(clave, None)
+
+    def __len__(self):
+        return len(self._claves)
+
+
+class FiltroDuplicados:
+    """Reconoce gastos que ya se guardaron para no escribirlos dos veces.
+
+    - Por update_id: Telegram reenvía el mismo update si el bot tardó en responder.
+    - Por huella (usuario + gasto) durante `ventana` segundos: doble toque en el botón
+      del método de pago, que llega como dos updates distintos con el mismo contenido.
+    """
+
+    def __init__(self, ventana=10.0, ttl_updates=600.0, max_claves=10000):
+        self._updates = CacheExpirable(ttl_updates, max_claves)
+        self._huellas = CacheExpirable(ventana, max_claves)
+
+    def _huella(self, update, descripcion, categoria, subcategoria, monto, metodo):
+        return (update.effective_user.id, descripcion, categoria, subcategoria, round(float(monto), 2), metodo)
+
+    def es_duplicado(self, update, descripcion, categoria, subcategoria, monto, metodo):
+        """Se llama justo antes de guardar: si no es un duplicado, queda registrado como visto.
+
+        Si después el guardado falla, hay que llamar a `olvidar` para que el reintento no se descarte.
+        """
+        if self._updates.visto(update.update_id):
+            metricas.contar('duplicados.update_id')
+            return True
+        if self._huellas.visto(self._huella(update, descripcion, categoria, subcategoria, monto, metodo)):
+            metricas.contar('duplicados.doble_toque')
+            return True
+        return False
+
+    def olvidar(self, update, descripcion, categoria, subcategoria, monto, metodo):
+        """Deshace el registro de `es_duplicado` para un gasto que no se llegó a guardar."""
+        self._updates.descartar(update.update_id)
+        self._huellas.descartar(self._huella(update, descripcion, categoria, subcategoria, monto, metodo))
@@ -0,0 +1,185 @@
+# importacion.py - Lectura y categorización de extractos bancarios/de tarjeta en CSV
+import csv
+import io
+import re
+
+import numpy as np
+import pandas as pd
+
+from textos import normalizar_texto
+
+# Nombres de columna aceptados (ya normalizados) para cada dato del extracto
+ALIAS_COLUMNAS = {
+    'Fecha': ['fecha', 'fecha operacion', 'fecha de operacion', 'fecha movimiento', 'date'],
+    'Descripcion': ['descripcion', 'concepto', 'detalle', 'comercio', 'movimiento', 'description'],
+    'Monto': ['monto', 'importe', 'importe en pesos', 'importe $', 'debito', 'valor', 'amount'],
+}
+
+CATEGORIA_DEFECTO = '📥 Importado'
+METODO_DEFECTO = '📥 Importado'
+
+
+def normalizar_descripciones(serie):
+    """normalizar_texto sobre una columna, calculándolo una sola vez por valor distinto."""
+    if serie.dtype.name == 'category':
+        # Con categóricas alcanza con normalizar las categorías y usar los códigos
+        tabla = np.array([normalizar_texto(categoria) for categoria in serie.cat.categories] + [''], dtype=object)
+        return pd.Series(tabla[serie.cat.codes.to_numpy()], index=serie.index)
+    valores = serie.astype(str)
+    unicos = valores.unique()
+    return valores.map(dict(zip(unicos, (normalizar_texto(valor) for valor in unicos))))
+
+
+def leer_csv(contenido):
+    """Lee el CSV como texto (sin inferir tipos), detectando codificación y separador."""
+    try:
+        texto = contenido.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        # Los bancos suelen exportar en Latin-1
+        texto = contenido.decode('latin-1')
+    try:
+        separador = csv.Sniffer().sniff(texto[:4096], delimiters=',;\t|').delimiter
+    except csv.Error:
+        separador = ','
+    return pd.read_csv(io.StringIO(texto), sep=separador, dtype=str, keep_default_na=False, skipinitialspace=True)
+
+
+def detectar_columnas(df):
+    """{'Fecha': columna, 'Descripcion': columna, 'Monto': columna}. Lanza ValueError si falta alguna."""
+    normalizadas = {normalizar_texto(columna): columna for columna in df.columns}
+    encontradas = {}
+    for dato, alias in ALIAS_COLUMNAS.items():
+        columna = next((normalizadas[nombre] for nombre in alias if nombre in normalizadas), None)
+        if columna is None:
+            raise ValueError(f"No encontré la columna de {dato.lower()} (probé: {', '.join(alias)}).")
+        encontradas[dato] = columna
+    return encontradas
+
+
+def parsear_fechas(serie):
+    """dd/mm/aaaa primero (el formato de la hoja); lo que no entre, con día primero y formato libre."""
+    fechas = pd.to_datetime(serie, format='%d/%m/%Y', errors='coerce')
+    faltantes = fechas.isna() & serie.str.strip().ne('')
+    if faltantes.any():
+        fechas[faltantes] = pd.to_datetime(serie[faltantes], dayfirst=True, format='mixed', errors='coerce')
+    return fechas.astype('datetime64[s]')
+
+
+def parsear_montos(serie):
+    """Convierte '$ 1.234,56', '-1234.56', '1,234.56' o '20.000' a centavos (Int64), todo vectorizado.
+
+    Con un solo tipo de separador seguido siempre de exactamente 3 dígitos ('20.000',
+    '1.234.567') es de miles, como en entrada_rapida.parsear_monto. Si aparecen los dos,
+    el decimal es el último.
+    """
+    limpio = serie.str.replace(r'[^\d,.\-]', '', regex=True)
+    solo_miles = limpio.str.fullmatch(r'-?\d+([.,])\d{3}(?:\1\d{3})*').fillna(False).astype(bool)
+    sin_separadores = limpio.str.replace(r'[.,]', '', regex=True)
+    coma_decimal = limpio.str.rfind(',') > limpio.str.rfind('.')
+    con_coma = limpio.str.replace('.', '', regex=False).str.replace(',', '.', regex=False)
+    con_punto = limpio.str.replace(',', '', regex=False)
+    normalizado = con_coma.where(coma_decimal, con_punto).where(~solo_miles, sin_separadores)
+    montos = pd.to_numeric(normalizado, errors='coerce')
+    return (montos * 100).round().astype('Int64')
+
+
+def reglas_de_config(config):
+    """Reglas (patrón, categoría, subcategoría), de la más específica a la más general.
+
+    Primero las de config['importacion']['reglas'] ({"texto": ["categoría", "subcategoría"]}),
+    después las descripciones de los gastos rápidos y por último los nombres de las subcategorías.
+    Todas se comparan sin mayúsculas, acentos ni emojis.
+    """
+    reglas = []
+    for texto, destino in config.get('importacion', {}).get('reglas', {}).items():
+        categoria, subcategoria = (list(destino) + [''])[:2]
+        reglas.append((re.escape(normalizar_texto(texto)), categoria, subcategoria))
+    for gasto in config.get('gastos_rapidos', {}).values():
+        reglas.append((re.escape(normalizar_texto(gasto['descripcion'])), gasto['categoria'], gasto.get('subcategoria', '')))
+    for categoria, subcategorias in config.get('categorias', {}).items():
+        for subcategoria in subcategorias:
+            nombre = normalizar_texto(subcategoria)
+            if nombre:
+                reglas.append((rf'\b{re.escape(nombre)}\b', categoria, subcategoria))
+    return reglas
+
+
+def categorizar(descripciones, reglas, categoria_defecto=CATEGORIA_DEFECTO):
+    """Asigna categoría y subcategoría con la primera regla cuyo patrón aparece en la descripción normalizada."""
+    categorias = pd.Series(categoria_defecto, index=descripciones.index, dtype=object)
+    subcategorias = pd.Series('', index=descripciones.index, dtype=object)
+    sin_asignar = pd.Series(True, index=descripciones.index)
+    for patron, categoria, subcategoria in reglas:
+        if not sin_asignar.any():
+            break
+        coincide = sin_asignar & descripciones.str.contains(patron, regex=True)
+        categorias[coincide] = categoria
+        subcategorias[coincide] = subcategoria
+        sin_asignar &= ~coincide
+    return categorias, subcategorias, int((~sin_asignar).sum())
+
+
+def hashes_gastos(fechas, centavos, descripciones):
+    """Un uint64 por gasto a partir de (día, centavos, descripción normalizada, n° de repetición).
+
+    El número de repetición distingue dos gastos idénticos el mismo día: si el
+    libro tiene uno y el extracto dos, solo se importa el segundo.
+    """
+    claves = pd.DataFrame({
+        'Fecha': pd.Series(fechas).dt.normalize().astype('datetime64[s]').to_numpy(),
+        'Centavos': pd.Series(centavos).astype('Int64').to_numpy(),
+        'Descripcion': np.asarray(descripciones, dtype=object),
+    })
+    claves['Repeticion'] = claves.groupby(['Fecha', 'Centavos', 'Descripcion'], dropna=False).cumcount()
+    return pd.util.hash_pandas_object(claves, index=False).to_numpy()
+
+
+def filtrar_duplicados(gastos, hashes_existentes):
+    """Separa los gastos del extracto que ya están en el libro. Devuelve (nuevos, cantidad de duplicados)."""
+    hashes = hashes_gastos(gastos['Fecha'], gastos['Centavos'], normalizar_descripciones(gastos['Descripcion']))
+    duplicados = np.isin(hashes, hashes_existentes)
+    return gastos[~duplicados].reset_index(drop=True), int(duplicados.sum())
+
+
+def parsear_extracto(contenido, reglas, metodo_pago, categoria_defecto=CATEGORIA_DEFECTO):
+    """Convierte un CSV de extracto en gastos con el formato del caché de Gastos.
+
+    Devuelve (gastos, descartadas, categorizadas). Si el extracto mezcla montos
+    positivos y negativos, los gastos son los del signo mayoritario y el resto
+    (pagos, devoluciones) se descarta.
+    """
+    crudo = leer_csv(contenido)
+    columnas = detectar_columnas(crudo)
+    fechas = parsear_fechas(crudo[columnas['Fecha']])
+    centavos = parsear_montos(crudo[columnas['Monto']])
+    descripciones = crudo[columnas['Descripcion']].str.strip()
+
+    validas = (fechas.notna() & centavos.ne(0).fillna(False)).astype(bool)
+    negativos = (centavos < 0).fillna(False).astype(bool) & validas
+    if negativos.any() and not negativos.equals(validas):
+        validas &= negativos if negativos.sum() * 2 >= validas.sum() else ~negativos
+
+    gastos = pd.DataFrame({
+        'Fecha': fechas[validas],
+        'Descripcion': descripciones[validas],
+        'Centavos': centavos[validas].abs(),
+    }).reset_index(drop=True)
+    categorias, subcategorias, categorizadas = categorizar(
+        normalizar_descripciones(gastos['Descripcion']), reglas, categoria_defecto
+    )
+    gastos['Categoría'] = categorias
+    gastos['Subcategoría'] = subcategorias
+    gastos['Metodo_Pago'] = metodo_pago
+    return gastos, int((~validas).sum()), categorizadas
+
+
+def filas_para_hoja(gastos):
+    """Filas listas para append_rows, en el orden de columnas de la hoja Gastos."""
+    fechas = gastos['Fecha'].dt.strftime('%d/%m/%Y')
+    montos = (gastos['Centavos'] / 100).astype(float)
+    return [
+        [fecha, descripcion, categoria, subcategoria, monto, metodo]
+        for fecha, descripcion, categoria, subcategoria, monto, metodo in zip(
+            fechas, gastos['Descripcion'], gastos['Categoría'], gastos['Subcategoría'], montos, gastos['Metodo_Pago']
+        )
+    ]
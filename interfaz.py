@@ -0,0 +1,116 @@
+# interfaz.py - Teclados y validadores compilados una sola vez a partir de config.json
+from collections import OrderedDict
+
+from telegram import ReplyKeyboardMarkup
+
+CANCELAR = '❌ Cancelar'
+MARCA_MODO_ACTUAL = '✅ '
+MARCA_FRECUENTE = '🔁 '
+# Menús rápidos personalizados que se guardan armados (uno por ranking distinto de gastos frecuentes)
+MAX_TECLADOS_FRECUENTES = 256
+
+DESTINOS_AHORRO = [
+    ['💵 Guardé Pesos', '📈 Compré Dólares'],
+    ['🏦 Invertí (PF, FCI, etc.)', 'Otro'],
+    [CANCELAR],
+]
+
+
+def _teclado(filas):
+    return ReplyKeyboardMarkup(filas, one_time_keyboard=True, resize_keyboard=True)
+
+
+def _en_filas(botones, columnas=2):
+    return [botones[i:i + columnas] for i in range(0, len(botones), columnas)]
+
+
+class Interfaz:
+    """Todo lo que los handlers le muestran al usuario o validan en cada paso.
+
+    Los ReplyKeyboardMarkup de python-telegram-bot son inmutables, así que se
+    arman al iniciar y se reusan en cada mensaje en lugar de reconstruirlos.
+    """
+
+    def __init__(self, categorias, metodos_pago, gastos_rapidos, ingresos_rapidos, personality_modes, formatear_pesos):
+        # --- Gastos paso a paso ---
+        self.teclado_categorias = _teclado([[categoria] for categoria in categorias])
+        self.teclados_subcategorias = {
+            categoria: _teclado([[subcategoria] for subcategoria in subcategorias])
+            for categoria, subcategorias in categorias.items() if subcategorias
+        }
+        # Todas las subcategorías juntas (o la categoría, si no tiene), para elegir a mano
+        self.opciones_gasto = [sub for cat, subs in categorias.items() for sub in (subs or [cat])]
+        self.teclado_opciones_gasto = _teclado(_en_filas(self.opciones_gasto))
+
+        # --- Métodos de pago ---
+        self.metodos = tuple(metodo for fila in metodos_pago for metodo in fila)
+        self.metodos_validos = frozenset(self.metodos)
+        self.teclado_metodos = _teclado(metodos_pago)
+
+        # --- Gastos rápidos: etiqueta del botón -> gasto ---
+        self.formatear_pesos = formatear_pesos
+        self.gastos_rapidos_por_boton = {}
+        botones = []
+        for clave, gasto in gastos_rapidos.items():
+            boton = f"{clave} {formatear_pesos(gasto['monto'])}"
+            botones.append(boton)
+            self.gastos_rapidos_por_boton[boton] = gasto
+            # También aceptamos la clave sola, por si la escriben a mano
+            self.gastos_rapidos_por_boton.setdefault(clave, gasto)
+        self._filas_gastos_rapidos = _en_filas(botones) + [[CANCELAR]]
+        self.teclado_gastos_rapidos = _teclado(self._filas_gastos_rapidos)
+        # tuple(ranking) -> (teclado, etiqueta -> gasto frecuente)
+        self._teclados_frecuentes = OrderedDict()
+
+        # --- Ingresos rápidos ---
+        self.teclado_ingresos_rapidos = _teclado(_en_filas(list(ingresos_rapidos)) + [[CANCELAR]])
+
+        # --- Ahorros ---
+        self.teclado_destinos_ahorro = _teclado(DESTINOS_AHORRO)
+
+        # --- Modos de personalidad: un teclado por modo actual (marcado con ✅) ---
+        self.teclados_modo = {
+            modo_actual: _teclado(
+                [[f"{MARCA_MODO_ACTUAL if clave == modo_actual else ''}{datos['name']}"] for clave, datos in personality_modes.items()]
+                + [[CANCELAR]]
+            )
+            for modo_actual in personality_modes
+        }
+        self.modos_por_boton = {}
+        for clave, datos in personality_modes.items():
+            self.modos_por_boton[datos['name']] = clave
+            self.modos_por_boton[f"{MARCA_MODO_ACTUAL}{datos['name']}"] = clave
+
+    def teclado_gastos_frecuentes(self, ranking):
+        """Menú rápido con los gastos más repetidos del usuario arriba de los de config.json.
+
+        `ranking` es RankingFrecuentes.top. Devuelve (teclado, etiqueta -> gasto con su 'metodo');
+        cada ranking distinto se arma una sola vez.
+        """
+        clave = tuple(ranking)
+        if not clave:
+            return self.teclado_gastos_rapidos, {}
+        if clave in self._teclados_frecuentes:
+            self._teclados_frecuentes.move_to_end(clave)
+            return self._teclados_frecuentes[clave]
+
+        por_boton = {}
+        for descripcion, categoria, subcategoria, centavos, metodo in clave:
+            monto = centavos // 100 if centavos % 100 == 0 else centavos / 100
+            boton = f"{MARCA_FRECUENTE}{descripcion} {self.formatear_pesos(monto)} · {metodo}"
+            por_boton[boton] = {
+                'descripcion': descripcion, 'categoria': categoria, 'subcategoria': subcategoria,
+                'monto': monto, 'metodo': metodo,
+            }
+        armado = (_teclado([[boton] for boton in por_boton] + self._filas_gastos_rapidos), por_boton)
+        self._teclados_frecuentes[clave] = armado
+        while len(self._teclados_frecuentes) > MAX_TECLADOS_FRECUENTES:
+            self._teclados_frecuentes.popitem(last=False)
+        return armado
+
+    def teclado_modo(self, modo_actual):
+        return self.teclados_modo.get(modo_actual) or _teclado([[CANCELAR]])
+
+    def teclado_de(self, opciones):
+        """Teclado para un subconjunto de opciones que no se conoce de antemano (p. ej. candidatos ambiguos)."""
+        return _teclado(_en_filas(list(opciones)))
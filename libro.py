@@ -0,0 +1,403 @@
+# libro.py - Libro contable de un spreadsheet: hojas, colas de escritura y cachés
+import asyncio
+import itertools
+import logging
+import re
+from datetime import datetime
+
+import pandas as pd
+from gspread.utils import rowcol_to_a1
+
+from agregados import CuboGastos, IndiceMensual, RankingFrecuentes
+from cache_hoja import PoliticaCache
+from cola_escritura import ColaEscritura
+from importacion import hashes_gastos, normalizar_descripciones
+
+COLUMNAS_GASTOS = ['Fecha', 'Descripcion', 'Categoría', 'Subcategoría', 'Monto', 'Metodo_Pago']
+# Columnas de texto que se guardan como categóricas (cada valor distinto se guarda una sola vez).
+# Descripcion queda como texto: casi todos sus valores son distintos y la categórica ocuparía más
+COLUMNAS_CATEGORICAS = ['Categoría', 'Subcategoría', 'Metodo_Pago']
+# Columnas con las que se reconoce que la última fila conocida de Gastos sigue siendo la misma.
+# Monto no se compara: según el formato regional de la hoja vuelve como '1.500' o '1500'
+COLUMNAS_HUELLA = ['Fecha', 'Descripcion', 'Categoría', 'Subcategoría', 'Metodo_Pago']
+# Versiones de df_gastos únicas en todo el proceso: un libro desalojado y vuelto a abrir nunca
+# repite una versión anterior, así los cachés derivados (p. ej. los gráficos) no sirven datos viejos
+_VERSIONES = itertools.count(1)
+
+
+def _fila_inicial_actualizada(respuesta):
+    """Extrae la primera fila escrita de la respuesta de append_rows ('Gastos!A102:F103' -> 102)."""
+    try:
+        rango = respuesta['updates']['updatedRange']
+    except (KeyError, TypeError):
+        return None
+    coincidencia = re.search(r'!\D*(\d+)', rango)
+    return int(coincidencia.group(1)) if coincidencia else None
+
+
+class Libro:
+    """Todo lo que depende de un spreadsheet: sus hojas, sus colas de escritura y sus cachés."""
+
+    def __init__(self, spreadsheet_id, hojas, io, config):
+        self.spreadsheet_id = spreadsheet_id
+        self.io = io
+        self.sheet_gastos, self.sheet_ingresos, self.sheet_presupuesto_bot, self.sheet_ahorros = hojas
+
+        # Si la hoja solo crece, las recargas traen únicamente las filas nuevas. Cada tantas sincronizaciones
+        # delta se relee todo igual, para recoger las ediciones a mano en filas viejas
+        conf_sheets = config.get('sheets', {})
+        self.delta_sync = conf_sheets.get('delta_sync', True)
+        self.recarga_completa_cada = conf_sheets.get('recarga_completa_cada', 12)
+        self._deltas_desde_completa = 0
+
+        # Categorías conocidas de antemano: así los códigos de las categóricas son estables entre cargas
+        categorias = config.get('categorias', {})
+        metodos_pago = [metodo for fila in config.get('metodos_pago', []) for metodo in fila]
+        self._semillas_categoricas = {
+            'Categoría': list(categorias),
+            'Subcategoría': [sub for subcategorias in categorias.values() for sub in subcategorias],
+            'Metodo_Pago': metodos_pago,
+        }
+
+        # --- Atributos para el Caché ---
+        # df_gastos: Fecha datetime64[s], categóricas para el texto repetido y 'Centavos' (Int64) en lugar de 'Monto'
+        self.df_gastos = None
+        self.presupuestos = {}
+        # Cada hoja se refresca por su cuenta: TTL y revalidación en segundo plano
+        conf_cache = config.get('cache', {})
+        self.cache_gastos = PoliticaCache('Gastos', self._refrescar_gastos, conf_cache.get('ttl_gastos', 300))
+        self.cache_presupuesto = PoliticaCache(
+            'PresupuestoBot', self._refrescar_presupuesto, conf_cache.get('ttl_presupuesto', 60)
+        )
+        # Filas de datos (sin encabezado) que sabemos que ya están escritas en la hoja Gastos
+        self._filas_en_hoja = None
+        # La hoja divergió del caché y no se pudo recargar: la próxima sincronización tiene que ser completa
+        self._recarga_completa_pendiente = False
+        self._encabezado_gastos = None
+        # Totales mensuales por categoría/subcategoría, mantenidos junto con df_gastos
+        self.indice = IndiceMensual()
+        # Gastos más repetidos para el menú rápido, también mantenidos con cada cambio de df_gastos
+        conf_frecuentes = config.get('gastos_frecuentes', {})
+        self.frecuentes = RankingFrecuentes(
+            cantidad=conf_frecuentes.get('cantidad', 4),
+            vida_media_dias=conf_frecuentes.get('vida_media_dias', 30),
+            minimo=conf_frecuentes.get('minimo', 2),
+        )
+        # Cambia con cada cambio de df_gastos; sirve de clave para los cachés derivados
+        self.version = next(_VERSIONES)
+        self._cubo = None
+        self._hashes = None
+        # Estimación de la memoria que ocupa el caché, para el límite del registro de tenants
+        self.memoria_estimada = 0
+
+        # --- Colas de escritura diferida (una por hoja) ---
+        conf_escritura = config.get('escritura', {})
+        intervalo_flush = conf_escritura.get('intervalo_flush', 2.0)
+        tamano_lote = conf_escritura.get('tamano_lote', 50)
+        self.cola_gastos = ColaEscritura(
+            self.sheet_gastos, 'Gastos', io, intervalo_flush, tamano_lote,
+            al_escribir=self._despues_de_escribir_gastos
+        )
+        self.cola_ingresos = ColaEscritura(self.sheet_ingresos, 'Ingresos', io, intervalo_flush, tamano_lote)
+        self.cola_ahorros = ColaEscritura(self.sheet_ahorros, 'Ahorros', io, intervalo_flush, tamano_lote)
+
+    @classmethod
+    async def abrir(cls, gc, spreadsheet_id, io, config):
+        """Abre el spreadsheet y resuelve sus cuatro hojas en paralelo, sin bloquear el loop."""
+        spreadsheet = await io.llamar(gc.open_by_key, spreadsheet_id)
+        hojas = await asyncio.gather(*[
+            io.llamar(spreadsheet.worksheet, nombre)
+            for nombre in ('Gastos', 'Ingresos', 'PresupuestoBot', 'Ahorros')
+        ])
+        return cls(spreadsheet_id, hojas, io, config)
+
+    async def cargar(self, forzar_recarga: bool = False, completa: bool = False):
+        """Asegura los cachés de Gastos y PresupuestoBot.
+
+        Sin argumentos solo espera si todavía no hay datos; con forzar_recarga se
+        sincroniza Gastos (delta si es posible) y con completa se relee todo.
+        """
+        if forzar_recarga or completa:
+            await asyncio.gather(self.cache_gastos.refrescar(completa=completa), self.cache_presupuesto.refrescar())
+        else:
+            await asyncio.gather(self.cache_gastos.asegurar(), self.cache_presupuesto.asegurar())
+
+    async def _refrescar_gastos(self, completa: bool = False):
+        # Pausamos la cola para que ningún lote se escriba mientras leemos la hoja
+        async with self.cola_gastos.pausada():
+            delta_posible = (
+                self.delta_sync and not completa and not self._recarga_completa_pendiente
+                and self.df_gastos is not None and self._deltas_desde_completa < self.recarga_completa_cada
+            )
+            if not (delta_posible and await self._sincronizar_delta_gastos()):
+                await self._recarga_completa_gastos()
+
+    async def _refrescar_presupuesto(self):
+        logging.info("Recargando datos de PresupuestoBot desde Google Sheets...")
+        records = await self.io.llamar(self.sheet_presupuesto_bot.get_all_records)
+        self.presupuestos = self._compilar_presupuestos(records)
+
+    def _compilar_presupuestos(self, records):
+        """Arma el diccionario categoría/subcategoría -> presupuesto, validando cada valor una sola vez."""
+        presupuestos = {}
+        for numero_fila, record in enumerate(records, start=2):
+            nombre = record.get('Categoria')
+            valor = record.get('Presupuesto')
+            # Si una categoría aparece repetida, vale la primera fila (como antes), aunque esté vacía o sea inválida
+            if not nombre or nombre in presupuestos:
+                continue
+            presupuestos[nombre] = 0.0
+            if valor in ('', None):
+                continue
+            try:
+                presupuestos[nombre] = float(valor)
+            except (ValueError, TypeError):
+                logging.warning(f"PresupuestoBot fila {numero_fila}: presupuesto inválido para '{nombre}': {valor!r}")
+        return presupuestos
+
+    async def _recarga_completa_gastos(self):
+        logging.info("Recargando datos de Gastos desde Google Sheets...")
+        list_of_lists = await self.io.llamar(self.sheet_gastos.get_all_values)
+        if len(list_of_lists) > 1:
+            headers = list_of_lists.pop(0)
+            self.df_gastos = self._normalizar_gastos(pd.DataFrame(list_of_lists, columns=headers))
+        else:
+            headers = list_of_lists[0] if list_of_lists else COLUMNAS_GASTOS
+            self.df_gastos = self._normalizar_gastos(pd.DataFrame(columns=COLUMNAS_GASTOS, dtype=object))
+        self._encabezado_gastos = headers
+        self._filas_en_hoja = len(self.df_gastos)
+        self._recarga_completa_pendiente = False
+        self._deltas_desde_completa = 0
+        self.indice.reconstruir(self.df_gastos)
+        self.frecuentes.reconstruir(self.df_gastos)
+        self.version = next(_VERSIONES)
+        self.memoria_estimada = int(self.df_gastos.memory_usage(deep=True).sum())
+
+        # Las filas que siguen en la cola todavía no están en la hoja: las sumamos al caché
+        for fila in self.cola_gastos.filas_pendientes():
+            self._aplicar_gasto(fila)
+
+    async def _sincronizar_delta_gastos(self):
+        """Trae solo las filas agregadas desde la última sincronización.
+
+        Devuelve False si el encabezado cambió, la hoja tiene menos filas que antes o la
+        última fila conocida ya no es la que tenemos en caché (se borraron filas y se
+        agregaron otras), en cuyo caso hace falta una recarga completa.
+        """
+        columnas = self._encabezado_gastos
+        ultima_columna = re.sub(r'\d', '', rowcol_to_a1(1, len(columnas)))
+        # Pedimos desde la última fila conocida (la fila 1 es el encabezado) para confirmar que sigue ahí
+        primera_fila = self._filas_en_hoja + 1
+        encabezado, filas = await self.io.llamar(
+            self.sheet_gastos.batch_get,
+            [f'A1:{ultima_columna}1', f'A{primera_fila}:{ultima_columna}']
+        )
+
+        if not encabezado or list(encabezado[0]) != list(columnas):
+            logging.info("El encabezado de Gastos cambió: hace falta una recarga completa.")
+            return False
+        if not filas or not any(filas[0]):
+            logging.info("La hoja Gastos tiene menos filas que la última sincronización: hace falta una recarga completa.")
+            return False
+        # Con 0 filas conocidas, filas[0] es el encabezado, que ya se comparó
+        if self._filas_en_hoja and not self._es_fila_en_cache(filas[0], self._filas_en_hoja - 1):
+            logging.info("La última fila conocida de Gastos cambió: hace falta una recarga completa.")
+            return False
+        self._deltas_desde_completa += 1
+
+        nuevas = [list(fila) + [''] * (len(columnas) - len(fila)) for fila in filas[1:]]
+        if nuevas:
+            logging.info(f"Sincronización delta de Gastos: {len(nuevas)} filas nuevas.")
+            self._agregar_al_cache(self._normalizar_gastos(pd.DataFrame(nuevas, columns=columnas)))
+            self._filas_en_hoja += len(nuevas)
+        return True
+
+    def _es_fila_en_cache(self, fila, posicion):
+        """True si la fila leída de la hoja coincide con la fila `posicion` de df_gastos."""
+        columnas = self._encabezado_gastos
+        if posicion >= len(self.df_gastos):
+            return False
+        leida = dict(zip(columnas, list(fila) + [''] * (len(columnas) - len(fila))))
+        cacheada = self.df_gastos.iloc[posicion]
+        for columna in COLUMNAS_HUELLA:
+            if columna not in leida or columna not in cacheada:
+                continue
+            if columna == 'Fecha':
+                fecha = pd.to_datetime(leida['Fecha'], format='%d/%m/%Y', errors='coerce')
+                if not (fecha == cacheada['Fecha'] or (pd.isna(fecha) and pd.isna(cacheada['Fecha']))):
+                    return False
+            elif str(leida[columna]) != str(cacheada[columna]):
+                return False
+        return True
+
+    def _normalizar_gastos(self, df):
+        """Convierte las columnas de texto de Gastos a sus tipos compactos.
+
+        Monto pasa a 'Centavos' enteros (sin errores de redondeo al sumar), Fecha a
+        datetime64[s] y las columnas de COLUMNAS_CATEGORICAS a categóricas. Las categorías
+        parten de las del caché actual (o de config.json) y se extienden con los valores nuevos.
+        """
+        monto = pd.to_numeric(df['Monto'].astype(str).str.replace(',', '.', regex=False), errors='coerce')
+        df['Monto'] = (monto * 100).round().astype('Int64')
+        df = df.rename(columns={'Monto': 'Centavos'})
+        df['Fecha'] = pd.to_datetime(df['Fecha'], format='%d/%m/%Y', dayfirst=True, errors='coerce').astype('datetime64[s]')
+        if 'Descripcion' in df:
+            df['Descripcion'] = df['Descripcion'].fillna('').astype(str)
+        for columna in COLUMNAS_CATEGORICAS:
+            if columna not in df:
+                continue
+            if self.df_gastos is not None and isinstance(self.df_gastos[columna].dtype, pd.CategoricalDtype):
+                semillas = list(self.df_gastos[columna].cat.categories)
+            else:
+                semillas = self._semillas_categoricas.get(columna, [])
+            valores = df[columna].fillna('').astype(str)
+            categorias = list(dict.fromkeys([*semillas, *valores.unique()]))
+            df[columna] = valores.astype(pd.CategoricalDtype(categorias))
+        return df
+
+    def _alinear_categorias(self, nuevas):
+        """Extiende las categorías de df_gastos con las de `nuevas` para que concat no vuelva a object."""
+        for columna in COLUMNAS_CATEGORICAS:
+            if columna not in nuevas or columna not in self.df_gastos:
+                continue
+            actual = self.df_gastos[columna]
+            if actual.dtype != nuevas[columna].dtype:
+                # Las categorías nuevas van al final: los códigos existentes no cambian
+                self.df_gastos[columna] = actual.cat.set_categories(nuevas[columna].cat.categories)
+
+    def _agregar_al_cache(self, nuevas):
+        """Suma filas ya normalizadas a df_gastos, al índice mensual y al ranking de frecuentes."""
+        self.indice.agregar_df(nuevas)
+        self.frecuentes.agregar_df(nuevas)
+        self.version = next(_VERSIONES)
+        if self.df_gastos.empty:
+            self.df_gastos = nuevas
+        else:
+            self._alinear_categorias(nuevas)
+            self.df_gastos = pd.concat([self.df_gastos, nuevas], ignore_index=True)
+        # Estimamos con el tamaño promedio por fila para no recorrer todo el frame en cada gasto
+        filas = len(self.df_gastos)
+        if filas > len(nuevas):
+            self.memoria_estimada += self.memoria_estimada * len(nuevas) // (filas - len(nuevas))
+        else:
+            self.memoria_estimada = int(self.df_gastos.memory_usage(deep=True).sum())
+
+    def _aplicar_gasto(self, fila):
+        """Agrega una fila nueva al caché de Gastos sin volver a descargar la hoja."""
+        self._aplicar_gastos([fila])
+
+    def _aplicar_gastos(self, filas):
+        columnas = list(self._encabezado_gastos or COLUMNAS_GASTOS)
+        valores = [([str(valor) for valor in fila] + [''] * len(columnas))[:len(columnas)] for fila in filas]
+        self._agregar_al_cache(self._normalizar_gastos(pd.DataFrame(valores, columns=columnas)))
+
+    async def leer_hoja(self, nombre):
+        """Lee Ingresos o Ahorros completa (estas hojas no se cachean), sumando las filas que siguen en cola.
+
+        Devuelve un DataFrame con Fecha como datetime y las columnas 'Monto*' numéricas.
+        """
+        hoja, cola = {
+            'Ingresos': (self.sheet_ingresos, self.cola_ingresos),
+            'Ahorros': (self.sheet_ahorros, self.cola_ahorros),
+        }[nombre]
+        valores = await self.io.llamar(hoja.get_all_values)
+        if not valores:
+            return pd.DataFrame()
+        encabezado = valores[0]
+        filas = valores[1:] + [[str(valor) for valor in fila] for fila in cola.filas_pendientes()]
+        filas = [(list(fila) + [''] * len(encabezado))[:len(encabezado)] for fila in filas]
+        df = pd.DataFrame(filas, columns=encabezado)
+        if 'Fecha' in df:
+            df['Fecha'] = pd.to_datetime(df['Fecha'], format='%d/%m/%Y', errors='coerce')
+        for columna in df.columns:
+            if columna.startswith('Monto'):
+                df[columna] = pd.to_numeric(df[columna].str.replace(',', '.', regex=False), errors='coerce')
+        return df
+
+    def hashes_gastos(self):
+        """Hashes de los gastos del caché para detectar duplicados al importar; se recalculan si cambió la versión."""
+        if self._hashes is None or self._hashes[0] != self.version:
+            df = self.df_gastos
+            hashes = hashes_gastos(df['Fecha'], df['Centavos'], normalizar_descripciones(df['Descripcion']))
+            self._hashes = (self.version, hashes)
+        return self._hashes[1]
+
+    def cubo(self):
+        """Cubo de agregados de Gastos; solo se recalcula si df_gastos cambió desde la última consulta."""
+        if self._cubo is None or self._cubo.version != self.version:
+            self._cubo = CuboGastos(self.df_gastos, self.version)
+        return self._cubo
+
+    async def resincronizar(self):
+        """Descarta el caché y vuelve a leer todo desde Google Sheets."""
+        await self.cargar(completa=True)
+
+    async def guardar_gasto(self, descripcion, categoria, subcategoria, monto, metodo_pago):
+        fecha = datetime.now().strftime("%d/%m/%Y")
+        fila = [fecha, descripcion, categoria, subcategoria, monto, metodo_pago]
+        self.cola_gastos.encolar(fila)
+        # No esperamos ningún refresco en curso: una recarga completa vuelve a aplicar las filas
+        # pendientes de la cola, y si el caché todavía no se cargó, la primera carga ya las incluye.
+        if self.df_gastos is not None:
+            self._aplicar_gasto(fila)
+
+    async def importar_gastos(self, filas):
+        """Agrega muchos gastos de una vez: un solo append_rows y una sola actualización del caché.
+
+        Devuelve False si la escritura falló (las filas quedan en cola y se reintentan).
+        """
+        if self.df_gastos is not None:
+            self._aplicar_gastos(filas)
+        return await self.cola_gastos.encolar_lote(filas)
+
+    async def _despues_de_escribir_gastos(self, lote, respuesta):
+        """Verifica que el lote quedó justo después de la última fila conocida."""
+        if self._filas_en_hoja is None:
+            return
+        # +1 por el encabezado y +1 porque es la primera fila libre
+        fila_esperada = self._filas_en_hoja + 2
+        fila_inicial = _fila_inicial_actualizada(respuesta)
+        if fila_inicial == fila_esperada:
+            self._filas_en_hoja += len(lote)
+            return
+
+        logging.warning(
+            f"La hoja Gastos divergió del caché (lote escrito en la fila {fila_inicial}, "
+            f"se esperaba {fila_esperada}). Recargando todo..."
+        )
+        try:
+            await self.resincronizar()
+        except Exception as e:
+            # Seguimos con el caché actual; la próxima lectura lo vuelve a cargar completo
+            self._recarga_completa_pendiente = True
+            self.cache_gastos.invalidar()
+            logging.error(f"No se pudo recargar Gastos después de la divergencia: {e!r}")
+
+    async def guardar_ingreso(self, descripcion, categoria, monto):
+        fecha = datetime.now().strftime("%d/%m/%Y")
+        self.cola_ingresos.encolar([fecha, descripcion, categoria, monto])
+
+    async def guardar_ahorro(self, monto_pesos, destino, monto_dolares=0):
+        """Encola un registro de ahorro para la hoja 'Ahorros'."""
+        fecha = datetime.now().strftime("%d/%m/%Y")
+        # El orden debe coincidir con las columnas que creaste
+        fila = [fecha, monto_pesos, destino, monto_dolares]
+        self.cola_ahorros.encolar(fila)
+
+    async def obtener_presupuesto(self, categoria_o_subcategoria):
+        await self.cache_presupuesto.asegurar()
+        return self.presupuestos.get(categoria_o_subcategoria, 0.0)
+
+    # --- Cola de escritura: apagado y observabilidad ---
+
+    @property
+    def colas_escritura(self):
+        return [self.cola_gastos, self.cola_ingresos, self.cola_ahorros]
+
+    async def cerrar(self):
+        """Vacía todas las colas de escritura del libro."""
+        for cola in self.colas_escritura:
+            await cola.cerrar()
+
+    def estadisticas_escritura(self):
+        return [dict(cola.estadisticas(), spreadsheet=self.spreadsheet_id) for cola in self.colas_escritura]
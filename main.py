@@ -1,13 +1,16 @@
 # main.py (Corregido)
+import time
+INICIO_PROCESO = time.perf_counter() # Para medir el tiempo de arranque hasta el primer update
 import os
 import sys
 import logging
 from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove, MenuButtonCommands
 from telegram.ext import (
-    Application, CommandHandler, MessageHandler, filters,
+    Application, CommandHandler, MessageHandler, TypeHandler, filters,
     ConversationHandler, ContextTypes
 )
 from bot import ExpenseBot
+from procesador_updates import ProcesadorPorUsuario
 
 # --- Configuración Inicial ---
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -16,7 +19,7 @@ sys.path.insert(0, current_dir)
 
 # --- Importaciones de Handlers ---
 from handlers.gasto import iniciar_gasto, recibir_descripcion, recibir_categoria, recibir_subcategoria, recibir_monto
-from handlers.rapido import iniciar_gasto_rapido, procesar_gasto_rapido, procesar_metodo_pago_rapido
+from handlers.rapido import iniciar_gasto_rapido, procesar_gasto_rapido, procesar_metodo_pago_rapido, MENSAJE_DUPLICADO
 from handlers.ingresos import iniciar_ingreso_rapido, procesar_ingreso_rapido, procesar_monto_ingreso
 from handlers.modo import cambiar_modo, procesar_cambio_modo
 from handlers.ahorro import (
@@ -24,7 +27,13 @@ from handlers.ahorro import (
     MONTO_AHORRO, DESTINO_AHORRO, MONTO_DOLARES
 )
 from handlers.resumen import generar_resumen
+from handlers.grafico import enviar_grafico
+from handlers.exportar import exportar
+from handlers.importar import instrucciones_importar, importar_extracto
+from handlers.texto_libre import registrar_texto_libre
 from handlers.recordatorios import RecordatorioManager, toggle_recordatorios, configurar_presupuesto
+from handlers.stats import mostrar_stats
+from metricas import instrumentar_handlers, metricas
 from datetime import datetime
 
 # --- Definición de Estados de Conversación ---
@@ -49,6 +58,7 @@ menu_markup = ReplyKeyboardMarkup(menu_keyboard, resize_keyboard=True)
 async def post_init(application: Application):
     """Tareas post-inicialización: configurar menú y recordatorios."""
     recordatorio_manager = RecordatorioManager(application)
+    application.bot_data['recordatorios'] = recordatorio_manager
     application.create_task(recordatorio_manager.loop_recordatorios())
     
     commands = [
@@ -60,6 +70,32 @@ async def post_init(application: Application):
     await application.bot.set_chat_menu_button(menu_button=MenuButtonCommands())
     logger.info("Botón de menú y comandos configurados.")
 
+    # Recarga config.json en caliente cuando cambia
+    application.create_task(application.bot_data['bot'].vigilante_config.vigilar())
+
+    # La conexión con Sheets y la carga de datos ocurren en segundo plano, sin demorar el arranque
+    if os.getenv('PRECALENTAR', '1') != '0':
+        application.create_task(application.bot_data['bot'].precalentar())
+
+    segundos = time.perf_counter() - INICIO_PROCESO
+    metricas.registrar_arranque('listo', segundos)
+    logger.info(f"⏱️ Bot listo para recibir updates {segundos:.2f}s después de iniciar el proceso.")
+
+async def registrar_primer_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Mide cuánto tardó el proceso en atender su primer update (no corta el resto de los handlers)."""
+    if 'primer_update' not in metricas.arranque:
+        segundos = time.perf_counter() - INICIO_PROCESO
+        metricas.registrar_arranque('primer_update', segundos)
+        logger.info(f"⏱️ Primer update recibido {segundos:.2f}s después de iniciar el proceso.")
+
+async def post_shutdown(application: Application):
+    """Vacía las colas de escritura pendientes antes de terminar el proceso."""
+    bot = application.bot_data.get('bot')
+    if bot:
+        await bot.cerrar()
+        for stats in bot.estadisticas_escritura():
+            logger.info(f"Cola de escritura al cerrar: {stats}")
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Función de bienvenida que muestra el menú."""
     await update.message.reply_text(
@@ -84,15 +120,21 @@ async def ayuda_extendida(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Muestra la ayuda extendida."""
     mensaje = (
         "🤖 *Bot de Gastos Personales*\n\n"
-        "Puedes usar los botones del menú o los siguientes comandos:\n\n"
+        "✍️ Podés escribir el gasto en una línea: `chino 3500 mp` o `nafta 20000 bbva credito`\n\n"
+        "También puedes usar los botones del menú o los siguientes comandos:\n\n"
         "💸 /gasto - Registrar gasto paso a paso\n"
         "⚡ /rapido - Gastos frecuentes rápidos\n"
         "💰 /ingreso - Registrar ingresos\n"
         "💹 /ahorro - Registrar un ahorro\n"
-        "📊 /resumen - Resumen mensual\n\n"
+        "📊 /resumen - Resumen mensual\n"
+        "🗓️ /resumen 03/2024, /resumen anual o /resumen 01/03/2024 15/04/2024 - Otros períodos\n"
+        "📈 /grafico - Gráfico del mes (acepta los mismos períodos)\n"
+        "📤 /exportar - Descargar gastos, ingresos y ahorros en CSV o Parquet\n"
+        "📥 /importar - Cargar un extracto del banco o la tarjeta (CSV)\n\n"
         "*Configuración:*\n"
         "🎭 /modo - Cambiar personalidad del bot\n"
-        "🔔 /recordatorios - Activar/desactivar recordatorios diarios\n\n"
+        "🔔 /recordatorios - Activar/desactivar recordatorios diarios\n"
+        "🕐 /recordatorios 09:00 21:30 - Elegir tus horarios (y zona horaria)\n\n"
         "*Otros:*\n"
         "❌ /cancel - Cancelar operación\n"
         "❓ /help o /menu - Ver esta ayuda o el menú"
@@ -104,11 +146,9 @@ async def recibir_metodo_pago_con_alerta(update: Update, context: ContextTypes.D
     metodo = update.message.text
     bot = context.bot_data['bot']
     user_id = update.effective_user.id
-    metodos_validos = [item for sublist in bot.metodos_pago for item in sublist]
 
-    if metodo not in metodos_validos:
-        reply_markup = ReplyKeyboardMarkup(bot.metodos_pago, one_time_keyboard=True, resize_keyboard=True)
-        await update.message.reply_text("❌ Método no válido. Seleccioná uno correcto:", reply_markup=reply_markup)
+    if metodo not in bot.interfaz.metodos_validos:
+        await update.message.reply_text("❌ Método no válido. Seleccioná uno correcto:", reply_markup=bot.interfaz.teclado_metodos)
         return METODO_PAGO
 
     desc = context.user_data['descripcion']
@@ -116,7 +156,18 @@ async def recibir_metodo_pago_con_alerta(update: Update, context: ContextTypes.D
     subcat = context.user_data.get('subcategoria', '')
     monto = context.user_data['monto']
 
-    await bot.guardar_gasto(desc, cat, subcat, monto, metodo)
+    if bot.duplicados.es_duplicado(update, desc, cat, subcat, monto, metodo):
+        # Update reenviado o doble toque: el gasto ya se guardó con el primero
+        await update.message.reply_text(MENSAJE_DUPLICADO, reply_markup=menu_markup)
+        context.user_data.clear()
+        return ConversationHandler.END
+
+    try:
+        await bot.guardar_gasto(desc, cat, subcat, monto, metodo, user_id=user_id)
+    except Exception:
+        # No se guardó: si el usuario reintenta, no es un duplicado
+        bot.duplicados.olvidar(update, desc, cat, subcat, monto, metodo)
+        raise
     alerta_presupuesto = await bot.verificar_presupuesto(cat, subcat, user_id)
     
     fecha = datetime.now().strftime("%d/%m/%Y")
@@ -145,7 +196,15 @@ def main():
 
     try:
         bot = ExpenseBot()
-        application = Application.builder().token(TOKEN).post_init(post_init).build()
+        builder = Application.builder().token(TOKEN).post_init(post_init).post_shutdown(post_shutdown)
+
+        # Con CONCURRENT_UPDATES > 1 se atienden varios usuarios a la vez, pero cada usuario en orden
+        concurrent_updates = int(os.getenv('CONCURRENT_UPDATES', '1'))
+        if concurrent_updates > 1:
+            builder = builder.concurrent_updates(ProcesadorPorUsuario(concurrent_updates))
+            logger.info(f"Procesando hasta {concurrent_updates} updates en paralelo (serializados por usuario).")
+
+        application = builder.build()
         application.bot_data['bot'] = bot
         application.bot_data['menu_markup'] = menu_markup
 
@@ -203,14 +262,43 @@ def main():
         application.add_handler(CommandHandler("menu", mostrar_menu))
         application.add_handler(CommandHandler("help", ayuda_extendida))
         
-        application.add_handler(MessageHandler(filters.Regex('^📊 Resumen$'), generar_resumen))
+        # El resumen no depende del estado de ninguna conversación: puede correr sin bloquear la cola de updates
+        application.add_handler(MessageHandler(filters.Regex('^📊 Resumen$'), generar_resumen, block=False))
+        application.add_handler(CommandHandler("resumen", generar_resumen, block=False))
+        application.add_handler(CommandHandler("grafico", enviar_grafico, block=False))
+        application.add_handler(CommandHandler("exportar", exportar, block=False))
+        application.add_handler(CommandHandler("importar", instrucciones_importar))
+        application.add_handler(MessageHandler(filters.Document.FileExtension('csv'), importar_extracto, block=False))
         application.add_handler(MessageHandler(filters.Regex('^❓ Ayuda$'), ayuda_extendida))
         
         application.add_handler(CommandHandler("recordatorios", toggle_recordatorios))
         application.add_handler(CommandHandler("presupuesto", configurar_presupuesto))
+        application.add_handler(CommandHandler("stats", mostrar_stats))
+
+        # Último del grupo 0: solo le llega el texto que no tomó ninguna conversación ni botón del menú.
+        # Los mensajes editados no cuentan (update.message es None y no son un gasto nuevo)
+        application.add_handler(MessageHandler(filters.UpdateType.MESSAGE & filters.TEXT & ~filters.COMMAND, registrar_texto_libre))
+
+        # Medimos latencia y errores de todos los handlers registrados hasta acá
+        instrumentar_handlers(application)
+        application.add_handler(TypeHandler(Update, registrar_primer_update), group=-1)
 
-        logger.info("🚀 Bot listo y corriendo...")
-        application.run_polling()
+        # --- Ingreso de updates: webhook si WEBHOOK_URL está configurado, polling si no ---
+        webhook_url = os.getenv('WEBHOOK_URL')
+        if webhook_url:
+            puerto = int(os.getenv('PORT', '8080'))
+            ruta = os.getenv('WEBHOOK_PATH', 'telegram')
+            logger.info(f"🚀 Bot listo, recibiendo updates por webhook en el puerto {puerto}...")
+            application.run_webhook(
+                listen='0.0.0.0',
+                port=puerto,
+                url_path=ruta,
+                webhook_url=f"{webhook_url.rstrip('/')}/{ruta}",
+                secret_token=os.getenv('WEBHOOK_SECRET'),
+            )
+        else:
+            logger.info("🚀 Bot listo y corriendo...")
+            application.run_polling()
 
     except Exception as e:
         logger.error(f"❌ Error al iniciar el bot: {e}", exc_info=True)
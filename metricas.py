@@ -0,0 +1,198 @@
+# metricas.py - Métricas en proceso: latencia de handlers, llamadas a Sheets, cachés y cuota
+import bisect
+import functools
+import time
+from collections import Counter, defaultdict, deque
+
+from telegram.ext import ConversationHandler
+
+# Límites de los buckets del histograma, en milisegundos
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+OPERACIONES_ESCRITURA = {'append_row', 'append_rows', 'update', 'batch_update', 'update_cell', 'insert_row', 'insert_rows'}
+
+
+class Histograma:
+    """Histograma de latencias con buckets fijos: memoria constante sin importar cuántas muestras haya."""
+
+    def __init__(self):
+        self.conteos = [0] * (len(BUCKETS_MS) + 1)
+        self.cantidad = 0
+        self.suma_ms = 0.0
+        self.maximo_ms = 0.0
+
+    def observar(self, ms):
+        self.conteos[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.cantidad += 1
+        self.suma_ms += ms
+        self.maximo_ms = max(self.maximo_ms, ms)
+
+    def percentil(self, p):
+        """Límite superior del bucket donde cae el percentil p (0-100)."""
+        if not self.cantidad:
+            return 0.0
+        objetivo = self.cantidad * p / 100
+        acumulado = 0
+        for i, conteo in enumerate(self.conteos):
+            acumulado += conteo
+            if acumulado >= objetivo:
+                return BUCKETS_MS[i] if i < len(BUCKETS_MS) else self.maximo_ms
+        return self.maximo_ms
+
+    @property
+    def media_ms(self):
+        return self.suma_ms / self.cantidad if self.cantidad else 0.0
+
+
+class Metricas:
+    """Acumula todas las métricas del proceso. Se usa a través de la instancia global `metricas`."""
+
+    def __init__(self):
+        self.inicio = time.time()
+        # Etapa del arranque -> segundos desde el inicio del proceso
+        self.arranque = {}
+        self.latencias = defaultdict(Histograma)
+        self.errores = Counter()
+        self.contadores = Counter()
+        self.llamadas_sheets = Counter()
+        self.bytes_sheets = Counter()
+        self.latencias_sheets = defaultdict(Histograma)
+        # Momentos de las llamadas del último minuto, para comparar contra la cuota de Google
+        self._lecturas_recientes = deque()
+        self._escrituras_recientes = deque()
+
+    # --- Registro ---
+
+    def observar(self, nombre, segundos, error=False):
+        self.latencias[nombre].observar(segundos * 1000)
+        if error:
+            self.errores[nombre] += 1
+
+    def registrar_arranque(self, etapa, segundos):
+        self.arranque.setdefault(etapa, segundos)
+
+    def contar(self, nombre, cantidad=1):
+        self.contadores[nombre] += cantidad
+
+    def registrar_llamada_sheets(self, operacion, segundos, cantidad_bytes, error=False):
+        self.llamadas_sheets[operacion] += 1
+        self.bytes_sheets[operacion] += cantidad_bytes
+        self.latencias_sheets[operacion].observar(segundos * 1000)
+        if error:
+            self.errores[f"sheets.{operacion}"] += 1
+        recientes = self._escrituras_recientes if operacion in OPERACIONES_ESCRITURA else self._lecturas_recientes
+        ahora = time.monotonic()
+        recientes.append(ahora)
+        # Se purga en cada llamada: si nadie pide /stats, las colas no crecen más allá de un minuto
+        self._purgar_recientes(ahora)
+
+    def _purgar_recientes(self, ahora):
+        limite = ahora - 60
+        for recientes in (self._lecturas_recientes, self._escrituras_recientes):
+            while recientes and recientes[0] < limite:
+                recientes.popleft()
+
+    # --- Consulta ---
+
+    def cuota_ultimo_minuto(self):
+        """(lecturas, escrituras) hechas a Sheets en los últimos 60 segundos."""
+        self._purgar_recientes(time.monotonic())
+        return len(self._lecturas_recientes), len(self._escrituras_recientes)
+
+    def ratio_cache(self, nombre):
+        """Proporción de lecturas del caché `nombre` que no tuvieron que esperar a Sheets."""
+        aciertos = self.contadores[f"cache.{nombre}.hit"] + self.contadores[f"cache.{nombre}.stale"]
+        total = aciertos + self.contadores[f"cache.{nombre}.miss"]
+        return aciertos / total if total else None
+
+    def reporte(self, cuota_lecturas=60, cuota_escrituras=60):
+        """Reporte de texto plano para el comando /stats."""
+        minutos = (time.time() - self.inicio) / 60
+        lineas = [f"📈 Métricas ({minutos:.0f} min de actividad)", ""]
+
+        if self.arranque:
+            etapas = ", ".join(f"{etapa} {segundos:.2f}s" for etapa, segundos in self.arranque.items())
+            lineas.append(f"🚀 Arranque: {etapas}")
+            lineas.append("")
+
+        lineas.append("⏱️ Handlers (n / media / p50 / p95 / máx ms / errores):")
+        for nombre, histo in sorted(self.latencias.items()):
+            lineas.append(
+                f"  {nombre}: {histo.cantidad} / {histo.media_ms:.0f} / {histo.percentil(50):.0f} / "
+                f"{histo.percentil(95):.0f} / {histo.maximo_ms:.0f} / {self.errores[nombre]}"
+            )
+
+        lineas.append("")
+        lineas.append("📄 Google Sheets (llamadas / KB / p95 ms / errores):")
+        for operacion, cantidad in sorted(self.llamadas_sheets.items()):
+            lineas.append(
+                f"  {operacion}: {cantidad} / {self.bytes_sheets[operacion] / 1024:.0f} / "
+                f"{self.latencias_sheets[operacion].percentil(95):.0f} / {self.errores[f'sheets.{operacion}']}"
+            )
+        lecturas, escrituras = self.cuota_ultimo_minuto()
+        lineas.append(f"  Cuota último minuto: lecturas {lecturas}/{cuota_lecturas}, escrituras {escrituras}/{cuota_escrituras}")
+
+        lineas.append("")
+        lineas.append("🗄️ Cachés (hit / stale / miss):")
+        nombres_cache = sorted({clave.split('.')[1] for clave in self.contadores if clave.startswith('cache.')})
+        for nombre in nombres_cache:
+            ratio = self.ratio_cache(nombre)
+            lineas.append(
+                f"  {nombre}: {self.contadores[f'cache.{nombre}.hit']} / {self.contadores[f'cache.{nombre}.stale']} / "
+                f"{self.contadores[f'cache.{nombre}.miss']} ({ratio:.0%} sin esperar)"
+            )
+
+        otros = {clave: valor for clave, valor in self.contadores.items() if not clave.startswith('cache.')}
+        if otros:
+            lineas.append("")
+            lineas.append("🔢 Contadores:")
+            lineas.extend(f"  {clave}: {valor}" for clave, valor in sorted(otros.items()))
+        return "\n".join(lineas)
+
+
+metricas = Metricas()
+
+
+def tamano_aproximado(valor):
+    """Bytes aproximados de un valor de gspread (listas/dicts de celdas), sin serializarlo."""
+    if isinstance(valor, str):
+        return len(valor)
+    if isinstance(valor, dict):
+        return sum(len(str(clave)) + tamano_aproximado(v) for clave, v in valor.items())
+    if isinstance(valor, (list, tuple)):
+        return sum(tamano_aproximado(v) for v in valor)
+    if valor is None:
+        return 0
+    return len(str(valor))
+
+
+def _instrumentar(callback, nombre):
+    @functools.wraps(callback)
+    async def envuelto(update, context):
+        inicio = time.perf_counter()
+        error = False
+        try:
+            return await callback(update, context)
+        except Exception:
+            error = True
+            raise
+        finally:
+            metricas.observar(nombre, time.perf_counter() - inicio, error)
+    return envuelto
+
+
+def instrumentar_handlers(application):
+    """Envuelve el callback de cada handler registrado (incluidos los de las conversaciones) para medirlo."""
+    def recorrer(handler):
+        if isinstance(handler, ConversationHandler):
+            for interno in handler.entry_points + handler.fallbacks:
+                recorrer(interno)
+            for handlers_estado in handler.states.values():
+                for interno in handlers_estado:
+                    recorrer(interno)
+        elif hasattr(handler, 'callback'):
+            handler.callback = _instrumentar(handler.callback, handler.callback.__name__)
+
+    for handlers_grupo in application.handlers.values():
+        for handler in handlers_grupo:
+            recorrer(handler)
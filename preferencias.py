@@ -0,0 +1,95 @@
+# preferencias.py - Preferencias por usuario persistidas en disco (modo, recordatorios, etc.)
+import asyncio
+import json
+import logging
+import os
+
+
+class AlmacenPreferencias:
+    """Guarda las preferencias en un JSON compacto.
+
+    El archivo se lee recién la primera vez que se consulta una sección, y los
+    cambios se escriben agrupados: cada modificación solo marca el almacén como
+    sucio y una tarea en segundo plano escribe todo `demora` segundos después.
+    """
+
+    def __init__(self, ruta, demora=2.0):
+        self.ruta = ruta
+        self.demora = demora
+        self._datos = None
+        self._tarea = None
+        self._sucio = False
+        self.escrituras = 0
+
+    def _cargar(self):
+        try:
+            with open(self.ruta, 'r', encoding='utf-8') as f:
+                crudo = json.load(f)
+        except FileNotFoundError:
+            crudo = {}
+        except (json.JSONDecodeError, OSError) as e:
+            logging.error(f"No se pudieron leer las preferencias de {self.ruta}: {e}")
+            crudo = {}
+        # JSON solo admite claves de texto: los IDs de Telegram vuelven a ser int
+        self._datos = {
+            nombre: {int(clave) if clave.lstrip('-').isdigit() else clave: valor for clave, valor in seccion.items()}
+            for nombre, seccion in crudo.items()
+        }
+
+    def seccion(self, nombre):
+        """Diccionario mutable de una sección (p. ej. 'modos'). Después de modificarlo, llamar a marcar_cambio()."""
+        if self._datos is None:
+            self._cargar()
+        return self._datos.setdefault(nombre, {})
+
+    def marcar_cambio(self):
+        self._sucio = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Fuera del loop (p. ej. en un script) no hay nada que agrupar: escribimos directo
+            self._escribir(self._serializar())
+            self._sucio = False
+            return
+        if self._tarea is None or self._tarea.done():
+            self._tarea = loop.create_task(self._guardar_diferido())
+
+    async def _guardar_diferido(self):
+        await asyncio.sleep(self.demora)
+        # Si hubo cambios mientras escribíamos, volvemos a escribir. Si la escritura falla, los
+        # cambios quedan pendientes y se reintentan con el próximo cambio o al apagar
+        while self._sucio:
+            if not await self._guardar_ahora():
+                return
+
+    async def _guardar_ahora(self):
+        """Escribe el estado actual. Devuelve False (y deja el almacén sucio) si no se pudo."""
+        # Se limpia antes de escribir para que los cambios que lleguen durante la escritura se vuelvan a guardar
+        self._sucio = False
+        texto = self._serializar()
+        try:
+            await asyncio.to_thread(self._escribir, texto)
+        except OSError as e:
+            self._sucio = True
+            logging.error(f"No se pudieron guardar las preferencias en {self.ruta}: {e!r}")
+            return False
+        return True
+
+    async def guardar(self):
+        """Espera a que se escriban los cambios pendientes (se usa al apagar el bot)."""
+        if self._tarea is not None and not self._tarea.done():
+            # No cancelamos la tarea (podría estar a mitad de una escritura): esperamos a que termine
+            await self._tarea
+        elif self._sucio:
+            await self._guardar_ahora()
+
+    def _serializar(self):
+        return json.dumps(self._datos or {}, ensure_ascii=False, separators=(',', ':'))
+
+    def _escribir(self, texto):
+        # Escribimos en un temporal y lo renombramos para no dejar nunca un archivo a medias
+        temporal = f"{self.ruta}.tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            f.write(texto)
+        os.replace(temporal, self.ruta)
+        self.escrituras += 1
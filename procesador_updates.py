@@ -0,0 +1,64 @@
+# procesador_updates.py - Procesamiento concurrente de updates, serializado por usuario
+import asyncio
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+class ProcesadorPorUsuario(BaseUpdateProcessor):
+    """Procesa updates de distintos usuarios en paralelo, pero los de un mismo usuario en orden.
+
+    Así los ConversationHandler ven los mensajes de cada usuario uno por uno, igual
+    que con el procesamiento secuencial, mientras un Sheets lento de un usuario no
+    frena a los demás.
+
+    BaseUpdateProcessor.process_update toma su semáforo antes de llamar a
+    do_process_update, así que un update que espera el lock de su usuario ocuparía
+    un lugar. Por eso al padre le pasamos un límite que no se alcanza y el límite
+    real lo aplica un semáforo propio, que se toma recién con el lock del usuario.
+    """
+
+    # Tope del semáforo de BaseUpdateProcessor (solo acota cuántos updates esperan a la vez)
+    MAX_EN_ESPERA = 10000
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(self.MAX_EN_ESPERA)
+        self.max_paralelos = max_concurrent_updates
+        self._semaforo = asyncio.BoundedSemaphore(max_concurrent_updates)
+        self._locks = {}
+        self._en_uso = {}
+
+    @staticmethod
+    def _clave(update):
+        if isinstance(update, Update):
+            if update.effective_user:
+                return ('usuario', update.effective_user.id)
+            if update.effective_chat:
+                return ('chat', update.effective_chat.id)
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        clave = self._clave(update)
+        if clave is None:
+            async with self._semaforo:
+                await coroutine
+            return
+
+        lock = self._locks.setdefault(clave, asyncio.Lock())
+        self._en_uso[clave] = self._en_uso.get(clave, 0) + 1
+        try:
+            async with lock:
+                async with self._semaforo:
+                    await coroutine
+        finally:
+            # Liberamos el lock del usuario cuando no queda ningún update suyo esperando
+            self._en_uso[clave] -= 1
+            if not self._en_uso[clave]:
+                del self._en_uso[clave]
+                del self._locks[clave]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
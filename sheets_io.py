@@ -0,0 +1,48 @@
+# sheets_io.py - Capa de E/S de Google Sheets fuera del event loop
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metricas import metricas, tamano_aproximado
+
+
+class SheetsIO:
+    """Ejecuta las llamadas bloqueantes de gspread en un pool de hilos acotado, con timeout por llamada."""
+
+    def __init__(self, max_hilos=4, timeout=30.0):
+        self.max_hilos = max_hilos
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix='sheets-io')
+
+    async def llamar(self, funcion, *args, timeout=None, idempotente=True, **kwargs):
+        """Corre funcion(*args, **kwargs) en el pool y espera el resultado sin bloquear el loop.
+
+        Si se supera el timeout se lanza asyncio.TimeoutError. El hilo no se puede
+        interrumpir, pero el handler que esperaba queda libre.
+
+        Con idempotente=False (escrituras como append_rows) no hay timeout propio: el
+        hilo seguiría escribiendo y quien reintente duplicaría las filas. El límite lo
+        pone el timeout HTTP del cliente de gspread (ver ExpenseBot._autorizar).
+        """
+        operacion = getattr(funcion, '__name__', 'desconocida')
+
+        def ejecutar():
+            # El tamaño se calcula en el hilo para no recorrer respuestas grandes en el loop
+            resultado = funcion(*args, **kwargs)
+            return resultado, tamano_aproximado(args) + tamano_aproximado(resultado)
+
+        loop = asyncio.get_running_loop()
+        inicio = time.perf_counter()
+        try:
+            futuro = loop.run_in_executor(self._executor, ejecutar)
+            if idempotente:
+                futuro = asyncio.wait_for(futuro, timeout or self.timeout)
+            resultado, cantidad_bytes = await futuro
+        except Exception:
+            metricas.registrar_llamada_sheets(operacion, time.perf_counter() - inicio, 0, error=True)
+            raise
+        metricas.registrar_llamada_sheets(operacion, time.perf_counter() - inicio, cantidad_bytes)
+        return resultado
+
+    def cerrar(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,90 @@
+# tenants.py - Registro de tenants: qué spreadsheet usa cada usuario y caché LRU de libros abiertos
+import asyncio
+import logging
+from collections import OrderedDict
+
+
+class RegistroTenants:
+    """Asigna a cada usuario de Telegram su spreadsheet y mantiene abiertos los libros más usados.
+
+    Los libros viven en un LRU acotado por cantidad y por memoria estimada. Al
+    desalojar uno se vacían sus colas de escritura antes de soltarlo.
+    """
+
+    def __init__(self, abrir_libro, spreadsheet_por_defecto, usuarios=None, max_libros=50, memoria_max_mb=256):
+        # abrir_libro: corrutina que recibe un spreadsheet_id y devuelve un Libro listo para usar
+        self._abrir_libro = abrir_libro
+        self.spreadsheet_por_defecto = spreadsheet_por_defecto
+        self.usuarios = {int(user_id): spreadsheet_id for user_id, spreadsheet_id in (usuarios or {}).items()}
+        self.max_libros = max_libros
+        self.memoria_max = memoria_max_mb * 1024 * 1024
+
+        self._libros = OrderedDict()
+        self._abriendo = {}
+        self._cerrando = {}
+
+    def spreadsheet_de(self, user_id):
+        """Spreadsheet del usuario; los que no están registrados comparten el spreadsheet por defecto."""
+        return self.usuarios.get(user_id, self.spreadsheet_por_defecto)
+
+    @property
+    def libros_abiertos(self):
+        return list(self._libros.values())
+
+    def memoria_total(self):
+        return sum(libro.memoria_estimada for libro in self._libros.values())
+
+    def libro_abierto(self, user_id):
+        """Libro del usuario si ya está abierto; None si habría que abrirlo (no espera a Sheets)."""
+        return self._libros.get(self.spreadsheet_de(user_id))
+
+    async def libro_para(self, user_id):
+        spreadsheet_id = self.spreadsheet_de(user_id)
+        libro = self._libros.get(spreadsheet_id)
+        if libro is not None:
+            self._libros.move_to_end(spreadsheet_id)
+            self._desalojar(conservar=spreadsheet_id)
+            return libro
+
+        # Si otro update ya está abriendo este spreadsheet, esperamos esa misma apertura
+        tarea = self._abriendo.get(spreadsheet_id)
+        if tarea is None:
+            tarea = asyncio.get_running_loop().create_task(self._abrir(spreadsheet_id))
+            self._abriendo[spreadsheet_id] = tarea
+        return await asyncio.shield(tarea)
+
+    async def _abrir(self, spreadsheet_id):
+        try:
+            # Si el libro se está desalojando, esperamos a que vacíe sus colas antes de releer la hoja
+            cierre = self._cerrando.get(spreadsheet_id)
+            if cierre is not None:
+                await cierre
+            libro = await self._abrir_libro(spreadsheet_id)
+            self._libros[spreadsheet_id] = libro
+            self._desalojar(conservar=spreadsheet_id)
+            return libro
+        finally:
+            self._abriendo.pop(spreadsheet_id, None)
+
+    def _desalojar(self, conservar):
+        """Saca los libros menos usados hasta respetar los límites (nunca el que se está usando)."""
+        while len(self._libros) > 1 and (len(self._libros) > self.max_libros or self.memoria_total() > self.memoria_max):
+            spreadsheet_id = next(iter(self._libros))
+            if spreadsheet_id == conservar:
+                break
+            libro = self._libros.pop(spreadsheet_id)
+            logging.info(f"Desalojando el libro {spreadsheet_id} del caché de tenants.")
+            tarea = asyncio.get_running_loop().create_task(libro.cerrar())
+            self._cerrando[spreadsheet_id] = tarea
+            tarea.add_done_callback(lambda t, clave=spreadsheet_id: self._quitar_cierre(clave, t))
+
+    def _quitar_cierre(self, spreadsheet_id, tarea):
+        if self._cerrando.get(spreadsheet_id) is tarea:
+            del self._cerrando[spreadsheet_id]
+
+    async def cerrar(self):
+        """Vacía las colas de todos los libros (abiertos o en proceso de desalojo)."""
+        for libro in self._libros.values():
+            await libro.cerrar()
+        if self._cerrando:
+            await asyncio.gather(*self._cerrando.values(), return_exceptions=True)
@@ -0,0 +1,5 @@
+# Los módulos del bot están en la raíz del repo, junto a bot.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
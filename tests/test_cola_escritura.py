@@ -0,0 +1,72 @@
+import asyncio
+
+from cola_escritura import ColaEscritura
+
+
+class HojaFalsa:
+    def __init__(self):
+        self.filas = [['Fecha', 'Descripcion', 'Categoría', 'Subcategoría', 'Monto', 'Metodo_Pago']]
+
+    def append_rows(self, filas, **kwargs):
+        primera = len(self.filas) + 1
+        self.filas.extend(filas)
+        return {'updates': {'updatedRange': f"'Gastos'!A{primera}:F{len(self.filas)}"}}
+
+    def get_all_values(self, **kwargs):
+        return [list(fila) for fila in self.filas]
+
+
+class IOFalso:
+    async def llamar(self, funcion, *args, timeout=None, idempotente=True, **kwargs):
+        return funcion(*args, **kwargs)
+
+
+def test_un_error_despues_de_escribir_no_frena_la_cola():
+    hoja = HojaFalsa()
+    llamadas = []
+
+    async def al_escribir(lote, respuesta):
+        llamadas.append(lote)
+        if len(llamadas) == 1:
+            raise ConnectionError("falló la recarga")
+
+    async def correr():
+        cola = ColaEscritura(hoja, 'Gastos', IOFalso(), intervalo_flush=0.01, al_escribir=al_escribir)
+        assert await cola.encolar_lote([['01/01/2024', 'café', 'Comida', '', 1500, 'Efectivo']])
+        cola.encolar(['02/01/2024', 'pan', 'Comida', '', 800, 'Efectivo'])
+        await asyncio.sleep(0.1)
+        await cola.cerrar()
+        return cola
+
+    cola = asyncio.run(correr())
+    assert [fila[1] for fila in hoja.filas[1:]] == ['café', 'pan']
+    assert len(llamadas) == 2
+    assert cola.profundidad == 0
+    assert cola.errores == 0
+
+
+def test_si_la_recarga_por_divergencia_falla_la_cola_sigue_escribiendo():
+    from libro import Libro
+
+    hoja = HojaFalsa()
+    # Alguien agregó una fila a mano: el próximo lote no cae donde el libro espera
+    hoja.filas.append(['01/01/2024', 'a mano', 'Comida', '', 100, 'Efectivo'])
+
+    async def correr():
+        libro = Libro('id', [hoja, None, None, None], IOFalso(), {'escritura': {'intervalo_flush': 0.01}})
+        libro._filas_en_hoja = 0
+
+        async def resincronizar():
+            raise ConnectionError("Sheets no responde")
+
+        libro.resincronizar = resincronizar
+        assert await libro.importar_gastos([['02/01/2024', 'café', 'Comida', '', 1500, 'Efectivo']])
+        await libro.guardar_gasto('pan', 'Comida', '', 800, 'Efectivo')
+        await asyncio.sleep(0.1)
+        await libro.cola_gastos.cerrar()
+        return libro
+
+    libro = asyncio.run(correr())
+    assert [fila[1] for fila in hoja.filas[1:]] == ['a mano', 'café', 'pan']
+    assert libro.cola_gastos.profundidad == 0
+    assert libro._recarga_completa_pendiente
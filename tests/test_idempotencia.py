@@ -0,0 +1,63 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from handlers.rapido import MENSAJE_DUPLICADO, _registrar_gasto_rapido
+from idempotencia import FiltroDuplicados
+
+GASTO = {'descripcion': 'café', 'categoria': 'Comida', 'subcategoria': '', 'monto': 1500}
+
+
+class BotFalso:
+    def __init__(self, fallos):
+        self.duplicados = FiltroDuplicados()
+        self.fallos = fallos
+        self.guardados = []
+
+    async def guardar_gasto(self, *datos, user_id=None):
+        if self.fallos:
+            self.fallos -= 1
+            raise ConnectionError("Sheets no responde")
+        self.guardados.append(datos)
+
+    def formatear_pesos(self, monto):
+        return f"${monto}"
+
+
+def _update(update_id, respuestas):
+    async def reply_text(texto, **kwargs):
+        respuestas.append(texto)
+
+    return SimpleNamespace(
+        update_id=update_id,
+        effective_user=SimpleNamespace(id=1),
+        message=SimpleNamespace(reply_text=reply_text),
+    )
+
+
+def test_doble_toque_se_descarta():
+    bot = BotFalso(fallos=0)
+    context = SimpleNamespace(bot_data={'bot': bot}, user_data={})
+    respuestas = []
+
+    asyncio.run(_registrar_gasto_rapido(_update(1, respuestas), context, GASTO, 'Efectivo'))
+    asyncio.run(_registrar_gasto_rapido(_update(2, respuestas), context, GASTO, 'Efectivo'))
+
+    assert len(bot.guardados) == 1
+    assert respuestas[-1] == MENSAJE_DUPLICADO
+
+
+def test_si_el_guardado_falla_el_reintento_no_es_duplicado():
+    bot = BotFalso(fallos=1)
+    context = SimpleNamespace(bot_data={'bot': bot}, user_data={})
+    respuestas = []
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(_registrar_gasto_rapido(_update(1, respuestas), context, GASTO, 'Efectivo'))
+    # Telegram reenvía el mismo update y además el usuario vuelve a tocar el botón
+    asyncio.run(_registrar_gasto_rapido(_update(1, respuestas), context, GASTO, 'Efectivo'))
+    asyncio.run(_registrar_gasto_rapido(_update(2, respuestas), context, GASTO, 'Efectivo'))
+
+    assert bot.guardados == [('café', 'Comida', '', 1500, 'Efectivo')]
+    assert MENSAJE_DUPLICADO not in respuestas[:1]
@@ -0,0 +1,22 @@
+import pandas as pd
+import pytest
+
+from importacion import parsear_montos
+
+
+@pytest.mark.parametrize('texto, centavos', [
+    ('$ 20.000', 2000000),
+    ('1.234.567', 123456700),
+    ('-12.345,67', -1234567),
+    ('1,234.56', 123456),
+    ('1500', 150000),
+    ('3.500', 350000),
+    ('1500,50', 150050),
+    ('12.5', 1250),
+])
+def test_parsear_montos(texto, centavos):
+    assert parsear_montos(pd.Series([texto], dtype=object)).iloc[0] == centavos
+
+
+def test_parsear_montos_invalido_es_na():
+    assert parsear_montos(pd.Series(['', 'abc'], dtype=object)).isna().all()
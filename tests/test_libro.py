@@ -0,0 +1,44 @@
+import asyncio
+
+from benchmarks.hoja_falsa import HojaFalsa
+from libro import COLUMNAS_GASTOS, Libro
+
+CAFE = ['01/03/2024', 'café', 'Comida', '', '1500', 'Efectivo']
+MEDIALUNAS = ['02/03/2024', 'medialunas', 'Comida', '', '2000', 'Efectivo']
+PAN = ['03/03/2024', 'pan', 'Comida', '', '800', 'Débito']
+
+
+class IOFalso:
+    async def llamar(self, funcion, *args, timeout=None, idempotente=True, **kwargs):
+        return funcion(*args, **kwargs)
+
+
+def _sincronizar_despues_de(filas, editar):
+    """Carga un libro con `filas`, aplica `editar` a la hoja y vuelve a sincronizar."""
+    hoja = HojaFalsa('Gastos', [COLUMNAS_GASTOS, *filas])
+    presupuestos = HojaFalsa('PresupuestoBot', [['Categoria', 'Presupuesto']])
+
+    async def correr():
+        libro = Libro('id', [hoja, None, presupuestos, None], IOFalso(), {})
+        await libro.cargar()
+        editar(hoja)
+        await libro.cargar(forzar_recarga=True)
+        return libro
+
+    return asyncio.run(correr())
+
+
+def test_delta_trae_solo_las_filas_nuevas():
+    libro = _sincronizar_despues_de([CAFE, MEDIALUNAS], lambda hoja: hoja.agregar_a_mano([PAN]))
+    assert list(libro.df_gastos['Descripcion']) == ['café', 'medialunas', 'pan']
+    assert libro._deltas_desde_completa == 1
+
+
+def test_borrar_y_agregar_la_misma_cantidad_de_filas_recarga_todo():
+    def borrar_y_agregar(hoja):
+        hoja.filas.pop()
+        hoja.agregar_a_mano([PAN])
+
+    libro = _sincronizar_despues_de([CAFE, MEDIALUNAS], borrar_y_agregar)
+    assert list(libro.df_gastos['Descripcion']) == ['café', 'pan']
+    assert libro._deltas_desde_completa == 0
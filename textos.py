@@ -0,0 +1,12 @@
+# textos.py - Normalización de texto compartida (búsquedas sin acentos, emojis ni mayúsculas)
+import unicodedata
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sin acentos ni emojis, con la puntuación como espacio ('🛒 Súper/Día' -> 'super dia')."""
+    descompuesto = unicodedata.normalize('NFKD', str(texto))
+    limpio = ''.join(
+        c if unicodedata.category(c)[0] in 'LNZ' else ' ' if unicodedata.category(c)[0] == 'P' else ''
+        for c in descompuesto
+    )
+    return ' '.join(limpio.lower().split())